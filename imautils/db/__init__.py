@@ -2,5 +2,7 @@
 
 from . import database
 from . import mongodatabase
+from . import mongodatabase_async
 from . import sqlitedatabase
 from . import utils
+from . import writer
@@ -2,14 +2,25 @@
 
 """Implementation of functions to handle database documents."""
 
-import json as _json
+import sys as _sys
+import time as _time
+import contextlib as _contextlib
+import threading as _threading
 import numpy as _np
 
 from . import sqlitedatabase as _sqlitedatabase
 from . import mongodatabase as _mongodatabase
+from . import mongodatabase_async as _mongodatabase_async
+from . import writer as _writer
 from . import utils as _utils
 
 
+FIELD_NAMES_CACHE_TTL = 30  # [s]
+
+_field_names_cache = {}
+_field_names_lock = _threading.Lock()
+
+
 class DatabaseError(Exception):
     """Database exception."""
 
@@ -26,12 +37,140 @@ class FileDocumentError(Exception):
         self.message = message
 
 
+def _get_cached_field_names(key):
+    """Return the cached field names of a collection, or None."""
+    with _field_names_lock:
+        cached = _field_names_cache.get(key)
+
+    if (cached is not None and
+            _time.monotonic() - cached[0] < FIELD_NAMES_CACHE_TTL):
+        return list(cached[1])
+    return None
+
+
+def _cache_field_names(key, field_names):
+    """Store the field names of a collection in cache, if not empty."""
+    if len(field_names) != 0:
+        with _field_names_lock:
+            _field_names_cache[key] = (_time.monotonic(), tuple(field_names))
+
+
+def _get_converter(dtype):
+    """Return a function that converts attribute values to dtype."""
+    if dtype == _np.ndarray:
+        empty = lambda: _np.array([])
+    elif dtype in (dict, list):
+        empty = dtype
+    else:
+        empty = None
+
+    is_json = dtype in (_np.ndarray, list, tuple, dict)
+    is_array = dtype == _np.ndarray
+
+    if dtype == _np.ndarray:
+        cast = _utils.to_array
+    else:
+        cast = dtype
+
+    def converter(value):
+        if isinstance(value, str) and value == _utils.EMPTY_STR:
+            value = None
+
+        if value is None:
+            return empty() if empty is not None else None
+
+        if is_json and isinstance(value, str):
+            value = _utils.json_loads(value)
+        elif is_array and isinstance(value, bytes):
+            return _utils.bytes_to_array(value)
+        elif is_array and _mongodatabase.is_bson_ndarray(value):
+            return _mongodatabase.bson_to_ndarray(value)
+
+        if value is None or isinstance(value, dtype):
+            return value
+        else:
+            return cast(value)
+
+    return converter
+
+
+def _get_copier(dtype):
+    """Return a function that copies attribute values, or None."""
+    if dtype == _np.ndarray:
+        return _np.copy
+    elif dtype == list:
+        return list.copy
+    else:
+        return None
+
+
+class _DatabaseDictSpec():
+    """Attribute specifications precomputed from a db_dict."""
+
+    def __init__(self, db_dict):
+        """Initialize object.
+
+        Args:
+            db_dict (dict): dictionary with database field names and types.
+
+        """
+        self.db_dict = db_dict
+
+        items = []
+        for attr_name, attr_dict in db_dict.items():
+            attr_name = _sys.intern(attr_name)
+            field = _sys.intern(attr_dict.get('field', attr_name))
+            dtype = attr_dict.get('dtype', _utils.DEFAULT_DTYPE)
+            not_null = attr_dict.get('not_null', _utils.DEFAULT_NOT_NULL)
+            items.append((attr_name, field, dtype, not_null))
+
+        self.items = tuple(items)
+        self.keys = frozenset(db_dict)
+        self.fields = frozenset(field for _, field, _, _ in items)
+        self.reverse_db_dict = {
+            field: attr_name for attr_name, field, _, _ in items}
+        self.save_items = tuple(
+            (attr_name, field, dtype in (_np.ndarray, list, tuple, dict),
+             dtype == _np.ndarray and db_dict[attr_name].get(
+                 'storage', _utils.DEFAULT_STORAGE) == 'binary')
+            for attr_name, field, dtype, _ in items)
+        self.has_date = 'date' in self.keys
+        self.has_hour = 'hour' in self.keys
+        self.converters = {
+            attr_name: _get_converter(dtype)
+            for attr_name, _, dtype, _ in items}
+        self.copiers = {
+            attr_name: _get_copier(dtype)
+            for attr_name, _, dtype, _ in items}
+        self.compare_attrs = tuple(
+            attr_name for attr_name, _, _, _ in items
+            if attr_name not in ('idn', 'date', 'hour'))
+        self.not_null_attrs = tuple(
+            attr_name for attr_name, _, _, not_null in items
+            if not_null and attr_name not in ('idn', 'date', 'hour'))
+
+
+_db_dict_specs = {}
+
+
+def _get_db_dict_spec(db_dict):
+    """Return the cached attribute specifications of a db_dict."""
+    spec = _db_dict_specs.get(id(db_dict))
+    if spec is None or spec.db_dict is not db_dict:
+        spec = _DatabaseDictSpec(db_dict)
+        _db_dict_specs[id(db_dict)] = spec
+    return spec
+
+
 class Database():
     """API for MongoDB or Sqlite database."""
 
     def __init__(
             self, database_name=None, mongo=False, server='localhost'):
-        """Initialize the object and connect to Mongo server, if applicable.
+        """Initialize the object.
+
+        The connection to the Mongo server, if applicable, is only created
+        when the database is first accessed.
 
         Args:
             database_name (str): database name.
@@ -42,11 +181,18 @@ class Database():
         self.database_name = database_name
         self.mongo = mongo
         self._server = server
+        self._client = None
 
-        if self.mongo:
-            self.client = _mongodatabase.db_connect(server=self._server)
-        else:
-            self.client = None
+    @property
+    def client(self):
+        """Return the MongoDB client, connecting on first access."""
+        if self._client is None and self.mongo:
+            self._client = _mongodatabase.db_connect(server=self._server)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
 
     @property
     def server(self):
@@ -59,8 +205,7 @@ class Database():
     @server.setter
     def server(self, value):
         self._server = value
-        if self.mongo:
-            self.client = _mongodatabase.db_connect(server=self._server)
+        self._client = None
 
     def db_update_database(
             self, database_name, mongo=False, server='localhost'):
@@ -85,8 +230,6 @@ class Database():
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self._server)
             return _mongodatabase.db_database_exists(
                 self.client, self.database_name)
         else:
@@ -101,8 +244,6 @@ class Database():
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self._server)
             return _mongodatabase.db_get_collections(
                 self.client, self.database_name)
         else:
@@ -115,7 +256,7 @@ class DatabaseCollection(Database):
     def __init__(
             self, database_name=None, collection_name=None,
             mongo=False, server='localhost'):
-        """Initialize the object and connect to Mongo server, if applicable.
+        """Initialize the object.
 
         Args:
             database_name (str): database name.
@@ -128,6 +269,19 @@ class DatabaseCollection(Database):
         super().__init__(
             database_name=database_name, mongo=mongo, server=server)
 
+    def _get_field_names_key(self):
+        """Return the field names cache key of the Mongo collection."""
+        return (self._server, self.database_name, self.collection_name)
+
+    def _clear_field_names_cache(self):
+        """Remove the collection's field names and schema from cache."""
+        if self.mongo:
+            with _field_names_lock:
+                _field_names_cache.pop(self._get_field_names_key(), None)
+        elif self.database_name:
+            _sqlitedatabase.refresh_schema(
+                self.database_name, self.collection_name)
+
     def db_collection_exists(self):
         """Check if the collection exists in database.
 
@@ -136,8 +290,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_collection_exists(
                 self.client, self.database_name, self.collection_name)
         else:
@@ -146,9 +298,8 @@ class DatabaseCollection(Database):
 
     def db_create_collection(self):
         """Create collection, with id as ascending index."""
+        self._clear_field_names_cache()
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_create_collection(
                 self.client, self.database_name, self.collection_name)
         else:
@@ -164,19 +315,27 @@ class DatabaseCollection(Database):
         independent from the other documents inside the collection, which
         may be different from the last document's fields.
 
+        The Mongo field names are cached for FIELD_NAMES_CACHE_TTL seconds,
+        since they are requested on every document read and update. The
+        SQLite column names are read from the table schema, which is cached
+        until the database schema changes.
+
         Returns:
             a list with the last document's field names.
 
         """
-        if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
-            return _mongodatabase.db_get_field_names(
-                self.client, self.database_name, self.collection_name)
-        else:
+        if not self.mongo:
             return _sqlitedatabase.db_get_column_names(
                 self.database_name, self.collection_name)
 
+        key = self._get_field_names_key()
+        field_names = _get_cached_field_names(key)
+        if field_names is None:
+            field_names = _mongodatabase.db_get_field_names(
+                self.client, self.database_name, self.collection_name)
+            _cache_field_names(key, field_names)
+        return field_names
+
     def db_get_field_types(self):
         """Return the field types of the last collection's document.
 
@@ -191,8 +350,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_get_field_types(
                 self.client, self.database_name, self.collection_name)
         else:
@@ -207,8 +364,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_get_first_id(
                 self.client, self.database_name, self.collection_name)
         else:
@@ -223,8 +378,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_get_last_id(
                 self.client, self.database_name, self.collection_name)
         else:
@@ -239,8 +392,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_get_values(
                 self.client, self.database_name, self.collection_name, 'id')
         else:
@@ -257,33 +408,35 @@ class DatabaseCollection(Database):
             True if successful, False otherwise.
 
         """
+        self._clear_field_names_cache()
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_delete(
                 self.client, self.database_name, self.collection_name, idns)
         else:
             return _sqlitedatabase.db_delete(
                 self.database_name, self.collection_name, idns)
 
-    def db_get_values(self, field):
+    def db_get_values(self, field, batch_size=None, distinct=False):
         """Return field values of the database collection.
 
         Args:
             field (str): field name.
+            batch_size (int, optional): number of documents per cursor
+                                        batch (only used for mongo).
+            distinct (bool, optional): if True, return each value only once.
 
         Returns:
             a list of field values.
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_get_values(
-                self.client, self.database_name, self.collection_name, field)
+                self.client, self.database_name, self.collection_name, field,
+                batch_size=batch_size, distinct=distinct)
         else:
             return _sqlitedatabase.db_get_values(
-                self.database_name, self.collection_name, field)
+                self.database_name, self.collection_name, field,
+                distinct=distinct)
 
     def db_get_value(self, field, idn):
         """Get field value from entry id.
@@ -297,8 +450,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_get_value(
                 self.client, self.database_name,
                 self.collection_name, field, idn)
@@ -306,6 +457,25 @@ class DatabaseCollection(Database):
             return _sqlitedatabase.db_get_value(
                 self.database_name, self.collection_name, field, idn)
 
+    def db_get_value_in(self, field, idns):
+        """Get field values of several entry ids with a single query.
+
+        Args:
+            field (str): field name.
+            idns (list): list of entry ids.
+
+        Returns:
+            a dict with entry ids and parameter values.
+
+        """
+        if self.mongo:
+            return _mongodatabase.db_get_value_in(
+                self.client, self.database_name,
+                self.collection_name, field, idns)
+        else:
+            return _sqlitedatabase.db_get_value_in(
+                self.database_name, self.collection_name, field, idns)
+
     def db_search_field(self, field, value):
         """Search field in database collection.
 
@@ -318,8 +488,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_search_field(
                 self.client, self.database_name,
                 self.collection_name, field, value)
@@ -327,6 +495,25 @@ class DatabaseCollection(Database):
             return _sqlitedatabase.db_search_column(
                 self.database_name, self.collection_name, field, value)
 
+    def db_search_field_in(self, field, values):
+        """Search several values of a field with a single query.
+
+        Args:
+            field (str): field to search.
+            values (list): list of values to search.
+
+        Returns:
+            a list of database entries.
+
+        """
+        if self.mongo:
+            return _mongodatabase.db_search_field_in(
+                self.client, self.database_name,
+                self.collection_name, field, values)
+        else:
+            return _sqlitedatabase.db_search_column_in(
+                self.database_name, self.collection_name, field, values)
+
     def db_search_collection(
             self, fields=None, filters=None,
             initial_idn=None, max_nr_lines=None):
@@ -344,8 +531,6 @@ class DatabaseCollection(Database):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_search_collection(
                 self.client, self.database_name, self.collection_name,
                 fields=fields, filters=filters, initial_idn=initial_idn,
@@ -356,6 +541,58 @@ class DatabaseCollection(Database):
                 columns=fields, filters=filters, initial_idn=initial_idn,
                 max_nr_lines=max_nr_lines)
 
+    def db_get_columns(self, fields=None, filters=None):
+        """Get the filtered collection entries as one array per field.
+
+        Args:
+            fields (list, optional): list of field names to filter.
+            filters (list, optional): list of filters to apply (must have the
+                                      same lengh as 'fields').
+
+        Returns:
+            a dict with field names and numpy arrays of values, in ascending
+            id order.
+
+        """
+        if self.mongo:
+            return _mongodatabase.db_get_columns(
+                self.client, self.database_name, self.collection_name,
+                fields=fields, filters=filters)
+        else:
+            return _sqlitedatabase.db_get_columns(
+                self.database_name, self.collection_name,
+                columns=fields, filters=filters)
+
+    def db_iter_collection(
+            self, fields=None, filters=None,
+            initial_idn=None, page_size=None):
+        """Iterate over the filtered collection entries.
+
+        Unlike db_search_collection, the entries are read from database
+        page by page while iterating, in ascending id order.
+
+        Args:
+            fields (list, optional): list of field names to filter.
+            filters (list, optional): list of filters to apply (must have the
+                                      same lengh as 'fields').
+            initial_idn (int, optional): initial id to start filter.
+            page_size (int, optional): number of entries read per page.
+
+        Returns:
+            an iterator over database entries.
+
+        """
+        if self.mongo:
+            return _mongodatabase.db_iter_collection(
+                self.client, self.database_name, self.collection_name,
+                fields=fields, filters=filters, initial_idn=initial_idn,
+                page_size=page_size)
+        else:
+            return _sqlitedatabase.db_iter_table(
+                self.database_name, self.collection_name,
+                columns=fields, filters=filters, initial_idn=initial_idn,
+                page_size=page_size)
+
 
 class DatabaseDocument(DatabaseCollection):
     """Database document or record."""
@@ -384,23 +621,9 @@ class DatabaseDocument(DatabaseCollection):
             server (str): MongoDB server.
 
         """
-        for attr in self.db_dict.keys():
+        for attr, _, _, _ in self._db_spec.items:
             if not hasattr(self, attr):
-                if 'dtype' in self.db_dict[attr].keys():
-                    dtype = self.db_dict[attr]['dtype']
-                else:
-                    dtype = _utils.DEFAULT_DTYPE
-
-                if dtype == _np.ndarray:
-                    setattr(self, attr, _np.array([]))
-                elif dtype == dict:
-                    setattr(self, attr, {})
-                elif dtype == list:
-                    setattr(self, attr, [])
-                elif dtype == list:
-                    setattr(self, attr, ())
-                else:
-                    setattr(self, attr, None)
+                setattr(self, attr, None)
 
         super().__init__(
             database_name=database_name,
@@ -408,26 +631,32 @@ class DatabaseDocument(DatabaseCollection):
             mongo=mongo,
             server=server)
 
+    @property
+    def _db_spec(self):
+        """Return the precomputed db_dict attribute specifications."""
+        return _get_db_dict_spec(self.db_dict)
+
     def __eq__(self, other):
         """Equality method."""
         if isinstance(other, self.__class__):
-            if len(self.__dict__) != len(other.__dict__):
+            self_dict = self.__dict__
+            other_dict = other.__dict__
+            if len(self_dict) != len(other_dict):
                 return False
 
-            for key in self.db_dict.keys():
-                if key not in other.db_dict.keys():
-                    return False
+            spec = self._db_spec
+            if not spec.keys <= other._db_spec.keys:
+                return False
 
-                self_value = self.__dict__[key]
-                other_value = other.__dict__[key]
+            for key in spec.compare_attrs:
+                self_value = self_dict[key]
+                other_value = other_dict[key]
 
-                if key in ['idn', 'date', 'hour']:
-                    pass
-                elif callable(self_value):
+                if callable(self_value):
                     pass
                 elif (isinstance(self_value, _np.ndarray) and
                       isinstance(other_value, _np.ndarray)):
-                    if not self_value.tolist() == other_value.tolist():
+                    if not _np.array_equal(self_value, other_value):
                         return False
                 elif (not isinstance(self_value, _np.ndarray) and
                       not isinstance(other_value, _np.ndarray)):
@@ -449,112 +678,75 @@ class DatabaseDocument(DatabaseCollection):
 
     def __setattr__(self, name, value):
         """Set attribute."""
-        if name not in self.db_dict:
+        converter = self._db_spec.converters.get(name)
+        if converter is None:
             super().__setattr__(name, value)
-
         else:
-            if 'dtype' in self.db_dict[name].keys():
-                dtype = self.db_dict[name]['dtype']
-            else:
-                dtype = _utils.DEFAULT_DTYPE
-
-            if isinstance(value, str) and value == _utils.EMPTY_STR:
-                value = None
-
-            if value is None:
-                if dtype == _np.ndarray:
-                    value = _np.array([])
-                elif dtype == dict:
-                    value = {}
-                elif dtype == list:
-                    value = []
-                elif dtype == list:
-                    value = ()
-                else:
-                    value = None
-
-            if dtype in (_np.ndarray, list, tuple, dict) and isinstance(
-                    value, str):
-                value = _json.loads(value)
-
-            if value is None or isinstance(value, dtype):
-                super().__setattr__(name, value)
-            elif dtype == _np.ndarray:
-                super().__setattr__(name, _utils.to_array(value))
-            else:
-                super().__setattr__(name, dtype(value))
+            super().__setattr__(name, converter(value))
 
     def __str__(self):
         """Printable string representation of the object."""
         fmtstr = '{0:<18s} : {1}\n'
-        r = ''
-        for key, value in self.__dict__.items():
-            r += fmtstr.format(key, str(value))
-        return r
+        return ''.join(
+            fmtstr.format(key, str(value))
+            for key, value in self.__dict__.items())
 
     def clear(self):
         """Clear object."""
-        for key in self.db_dict.keys():
-            try:
-                if isinstance(self.__dict__[key], _np.ndarray):
-                    self.__dict__[key] = _np.array([])
-                elif isinstance(self.__dict__[key], dict):
-                    self.__dict__[key] = {}
-                elif isinstance(self.__dict__[key], list):
-                    self.__dict__[key] = []
-                elif isinstance(self.__dict__[key], tuple):
-                    self.__dict__[key] = ()
-                else:
-                    self.__dict__[key] = None
-            except KeyError:
-                pass
+        self_dict = self.__dict__
+        for key, converter in self._db_spec.converters.items():
+            if key in self_dict:
+                self_dict[key] = converter(None)
         return True
 
     def copy(self):
         """Return a copy of the object."""
         _copy = type(self)()
-        for key in self.__dict__:
-            if isinstance(self.__dict__[key], _np.ndarray):
-                _copy.__dict__[key] = _np.copy(self.__dict__[key])
-            elif isinstance(self.__dict__[key], list):
-                _copy.__dict__[key] = self.__dict__[key].copy()
-            else:
-                _copy.__dict__[key] = self.__dict__[key]
+        _copy_dict = _copy.__dict__
+        copiers = self._db_spec.copiers
+        for key, value in self.__dict__.items():
+            if key in copiers:
+                copier = copiers[key]
+                if copier is not None:
+                    value = copier(value)
+            elif isinstance(value, _np.ndarray):
+                value = _np.copy(value)
+            elif isinstance(value, list):
+                value = value.copy()
+            _copy_dict[key] = value
         return _copy
 
     def db_create_collection(self):
         """Create collection, with id as ascending index."""
+        self._clear_field_names_cache()
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             return _mongodatabase.db_create_collection(
                 self.client, self.database_name, self.collection_name)
         else:
             return _sqlitedatabase.db_create_table(
                 self.database_name, self.collection_name, self.db_dict)
 
-    def db_save(self):
-        """Insert a document into a database collection.
+    def _serialize_values(self, idn, date, hour):
+        """Get the dict of field values to save in database.
+
+        Args:
+            idn (int): entry id (None for new entries).
+            date (str): date to use if the date attribute is not set.
+            hour (str): hour to use if the hour attribute is not set.
 
         Returns:
-            The id of the saved database document.
+            a dict with the values to save in database.
 
         """
         values_dict = {}
-        date, hour = _utils.get_date_hour()
 
-        reverse_db_dict = {}
-        for k, v in self.db_dict.items():
-            if 'field' in v.keys():
-                field = v['field']
-            else:
-                field = k
-            reverse_db_dict[field] = k
+        spec = self._db_spec
+        reverse_db_dict = spec.reverse_db_dict
 
         if 'id' in reverse_db_dict.keys():
-            setattr(self, reverse_db_dict['id'], None)
+            setattr(self, reverse_db_dict['id'], idn)
         else:
-            values_dict['id'] = None
+            values_dict['id'] = idn
 
         if 'date' in reverse_db_dict.keys():
             if getattr(self, reverse_db_dict['date']) is None:
@@ -568,40 +760,122 @@ class DatabaseDocument(DatabaseCollection):
         else:
             values_dict['hour'] = hour
 
-        for attr_name in self.db_dict:
-            if 'field' in self.db_dict[attr_name].keys():
-                field = self.db_dict[attr_name]['field']
-            else:
-                field = attr_name
-
-            if 'dtype' in self.db_dict[attr_name].keys():
-                dtype = self.db_dict[attr_name]['dtype']
-            else:
-                dtype = _utils.DEFAULT_DTYPE
-
+        for attr_name, field, is_json, is_binary in spec.save_items:
             value = getattr(self, attr_name)
-            if value is not None and dtype in (_np.ndarray, list, tuple, dict):
-                if isinstance(value, _np.ndarray):
-                    value = value.tolist()
-
+            if is_json and value is not None:
                 if not self.mongo:
-                    value = _json.dumps(value)
+                    if is_binary:
+                        value = _utils.array_to_bytes(value)
+                    else:
+                        value = _utils.json_dumps(value)
+                elif isinstance(value, _np.ndarray):
+                    value = _mongodatabase.ndarray_to_bson(value)
 
             values_dict[field] = value
 
+        return values_dict
+
+    def db_save(self):
+        """Insert a document into a database collection.
+
+        Returns:
+            The id of the saved database document.
+
+        """
+        date, hour = _utils.get_date_hour()
+        values_dict = self._serialize_values(None, date, hour)
+
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             idn = _mongodatabase.db_save(
                 self.client, self.database_name,
                 self.collection_name, values_dict)
+            self._clear_field_names_cache()
         else:
             idn = _sqlitedatabase.db_save(
                 self.database_name, self.collection_name, values_dict)
 
-        setattr(self, reverse_db_dict['id'], idn)
+        setattr(self, self._db_spec.reverse_db_dict['id'], idn)
         return idn
 
+    def db_save_background(self):
+        """Queue the document to be saved by the background writer.
+
+        The values are serialized on the calling thread, and consecutive
+        queued documents are inserted together. The document id is set by
+        the writer thread once the document is saved.
+
+        Returns:
+            a concurrent.futures.Future with the id of the saved document.
+
+        """
+        date, hour = _utils.get_date_hour()
+        values_dict = self._serialize_values(None, date, hour)
+        id_attr = self._db_spec.reverse_db_dict['id']
+
+        def callback(idn):
+            setattr(self, id_attr, idn)
+            if self.mongo:
+                self._clear_field_names_cache()
+
+        target = (
+            self.mongo, self.server, self.database_name, self.collection_name)
+        return _writer.get_writer().submit(
+            target, values_dict, callback=callback)
+
+    @classmethod
+    def db_save_many(cls, docs, batch_size=1000, bulk_load=False):
+        """Insert several documents into a database collection.
+
+        The documents are inserted in batches, with one database round-trip
+        per batch. All documents must use the same database collection.
+
+        Args:
+            docs (list): list of DatabaseDocument objects.
+            batch_size (int, optional): number of documents per batch.
+            bulk_load (bool, optional): for sqlite databases, drop the table
+                indexes during the insertion and create them again at the
+                end (see sqlitedatabase.db_bulk_load).
+
+        Returns:
+            a list with the ids of the saved database documents.
+
+        """
+        if len(docs) == 0:
+            return []
+
+        first = docs[0]
+        if bulk_load and not first.mongo:
+            context = _sqlitedatabase.db_bulk_load(
+                first.database_name, first.collection_name)
+        else:
+            context = _contextlib.nullcontext()
+
+        date, hour = _utils.get_date_hour()
+        idns = []
+        with context:
+            for start in range(0, len(docs), batch_size):
+                batch = docs[start:start + batch_size]
+                values_dicts = [
+                    doc._serialize_values(None, date, hour) for doc in batch]
+
+                if first.mongo:
+                    batch_idns = _mongodatabase.db_save_many(
+                        first.client, first.database_name,
+                        first.collection_name, values_dicts)
+                else:
+                    batch_idns = _sqlitedatabase.db_save_many(
+                        first.database_name, first.collection_name,
+                        values_dicts)
+
+                for doc, idn in zip(batch, batch_idns):
+                    setattr(doc, doc._db_spec.reverse_db_dict['id'], idn)
+                idns.extend(batch_idns)
+
+        if first.mongo:
+            first._clear_field_names_cache()
+
+        return idns
+
     def db_read(self, idn=None):
         """Read a document (collection entry) from database.
 
@@ -613,8 +887,6 @@ class DatabaseDocument(DatabaseCollection):
 
         """
         if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
             values_dict = _mongodatabase.db_read(
                 self.client, self.database_name, self.collection_name, idn=idn)
         else:
@@ -624,20 +896,23 @@ class DatabaseDocument(DatabaseCollection):
         if len(values_dict) == 0:
             return False
 
-        field_names = self.db_get_field_names()
+        self._set_values(values_dict, self.db_get_field_names())
+        return True
 
-        for attr_name in self.db_dict:
-            if 'field' in self.db_dict[attr_name].keys():
-                field = self.db_dict[attr_name]['field']
-            else:
-                field = attr_name
+    def _set_values(self, values_dict, field_names):
+        """Set attributes from the field values read from database.
 
-            if field not in field_names:
-                if 'not_null' in self.db_dict[attr_name].keys():
-                    not_null = self.db_dict[attr_name]['not_null']
-                else:
-                    not_null = _utils.DEFAULT_NOT_NULL
+        Args:
+            values_dict (dict): dict with values read from database.
+            field_names (list): list of collection field names.
+
+        """
+        spec = self._db_spec
+        field_names = frozenset(field_names)
+        all_fields = spec.fields <= field_names
 
+        for attr_name, field, _, not_null in spec.items:
+            if not all_fields and field not in field_names:
                 if not_null:
                     msg = 'Field {0:s} not found in database.'.format(field)
                     raise DatabaseError(msg)
@@ -652,7 +927,17 @@ class DatabaseDocument(DatabaseCollection):
             except AttributeError:
                 pass
 
-        return True
+    def _check_field_names(self, field_names):
+        """Raise DatabaseError if a document field is not in field_names."""
+        spec = self._db_spec
+        field_names = frozenset(field_names)
+        if spec.fields <= field_names:
+            return
+
+        for _, field, _, _ in spec.items:
+            if field not in field_names:
+                msg = 'Field {0:s} not found in database.'.format(field)
+                raise DatabaseError(msg)
 
     def db_update(self, idn):
         """Update a collection's document from database.
@@ -664,69 +949,189 @@ class DatabaseDocument(DatabaseCollection):
             True if update was sucessful, False if update failed.
 
         """
-        values_dict = {}
-        field_names = self.db_get_field_names()
-        date, hour = _utils.get_date_hour()
+        self._check_field_names(self.db_get_field_names())
 
-        reverse_db_dict = {}
-        for k, v in self.db_dict.items():
-            if 'field' in v.keys():
-                field = v['field']
-            else:
-                field = k
-            reverse_db_dict[field] = k
+        date, hour = _utils.get_date_hour()
+        values_dict = self._serialize_values(idn, date, hour)
 
-        if 'id' in reverse_db_dict.keys():
-            setattr(self, reverse_db_dict['id'], idn)
+        if self.mongo:
+            return _mongodatabase.db_update(
+                self.client, self.database_name,
+                self.collection_name, values_dict, idn)
         else:
-            values_dict['id'] = idn
+            return _sqlitedatabase.db_update(
+                self.database_name, self.collection_name, values_dict, idn)
 
-        if 'date' in reverse_db_dict.keys():
-            if getattr(self, reverse_db_dict['date']) is None:
-                setattr(self, reverse_db_dict['date'], date)
-        else:
-            values_dict['date'] = date
+    @classmethod
+    def db_update_many(cls, docs, idns, batch_size=1000):
+        """Update several collection's documents from database.
 
-        if 'hour' in reverse_db_dict.keys():
-            if getattr(self, reverse_db_dict['hour']) is None:
-                setattr(self, reverse_db_dict['hour'], hour)
-        else:
-            values_dict['hour'] = hour
+        The documents are updated in batches, with one database round-trip
+        per batch. All documents must use the same database collection.
+        The ids are checked before the first batch: if an id is not found,
+        no document is updated.
 
-        for attr_name in self.db_dict:
-            if 'field' in self.db_dict[attr_name].keys():
-                field = self.db_dict[attr_name]['field']
-            else:
-                field = attr_name
+        Args:
+            docs (list): list of DatabaseDocument objects.
+            idns (list): list of entry ids.
+            batch_size (int, optional): number of documents per batch.
+
+        Returns:
+            True if all documents were updated, False if an id was not
+            found.
+
+        """
+        if len(docs) != len(idns):
+            msg = 'Inconsistent number of documents and ids.'
+            raise DatabaseError(msg)
+
+        if len(docs) == 0:
+            return True
+
+        first = docs[0]
+        field_names = first.db_get_field_names()
+        for doc in docs:
+            doc._check_field_names(field_names)
 
-            if 'dtype' in self.db_dict[attr_name].keys():
-                dtype = self.db_dict[attr_name]['dtype']
+        if len(first.db_get_value_in('id', idns)) != len(set(idns)):
+            return False
+
+        date, hour = _utils.get_date_hour()
+        for start in range(0, len(docs), batch_size):
+            batch = docs[start:start + batch_size]
+            batch_idns = idns[start:start + batch_size]
+            values_dicts = [
+                doc._serialize_values(idn, date, hour)
+                for doc, idn in zip(batch, batch_idns)]
+
+            if first.mongo:
+                updated = _mongodatabase.db_update_many(
+                    first.client, first.database_name,
+                    first.collection_name, values_dicts, batch_idns)
             else:
-                dtype = _utils.DEFAULT_DTYPE
+                updated = _sqlitedatabase.db_update_many(
+                    first.database_name, first.collection_name,
+                    values_dicts, batch_idns)
 
-            if field not in field_names:
-                msg = 'Field {0:s} not found in database.'.format(field)
-                raise DatabaseError(msg)
+            if not updated:
+                return False
 
-            value = getattr(self, attr_name)
-            if value is not None and dtype in (_np.ndarray, list, tuple, dict):
-                if isinstance(value, _np.ndarray):
-                    value = value.tolist()
+        return True
 
-                if not self.mongo:
-                    value = _json.dumps(value)
 
-            values_dict[field] = value
+class AsyncDatabaseDocument(DatabaseDocument):
+    """Database document with asynchronous MongoDB access.
 
-        if self.mongo:
-            if self.client is None:
-                self.client = _mongodatabase.db_connect(server=self.server)
-            return _mongodatabase.db_update(
-                self.client, self.database_name,
-                self.collection_name, values_dict, idn)
-        else:
-            return _sqlitedatabase.db_update(
-                self.database_name, self.collection_name, values_dict, idn)
+    The coroutines share one client per server and event loop, so many
+    requests can be awaited together, e.g.
+    ``await asyncio.gather(*[doc.db_read(idn) for doc, idn in ...])``.
+    Sqlite documents run the synchronous implementation.
+    """
+
+    def _get_async_client(self):
+        return _mongodatabase_async.db_connect(server=self._server)
+
+    async def _async_get_field_names(self):
+        key = self._get_field_names_key()
+        field_names = _get_cached_field_names(key)
+        if field_names is None:
+            field_names = await _mongodatabase_async.db_get_field_names(
+                self._get_async_client(), self.database_name,
+                self.collection_name)
+            _cache_field_names(key, field_names)
+        return field_names
+
+    async def db_search_collection(
+            self, fields=None, filters=None,
+            initial_idn=None, max_nr_lines=None):
+        """Filter collection entries.
+
+        Args:
+            fields (list, optional): list of field names to filter.
+            filters (list, optional): list of filters to apply (must have the
+                                      same lengh as 'fields').
+            initial_idn (int, optional): initial id to start filter.
+            max_nr_lines (int, optional): maximum number of lines.
+
+        Returns:
+            a list of database entries.
+
+        """
+        if not self.mongo:
+            return super().db_search_collection(
+                fields=fields, filters=filters, initial_idn=initial_idn,
+                max_nr_lines=max_nr_lines)
+
+        return await _mongodatabase_async.db_search_collection(
+            self._get_async_client(), self.database_name,
+            self.collection_name, fields=fields, filters=filters,
+            initial_idn=initial_idn, max_nr_lines=max_nr_lines)
+
+    async def db_save(self):
+        """Insert a document into a database collection.
+
+        Returns:
+            The id of the saved database document.
+
+        """
+        if not self.mongo:
+            return super().db_save()
+
+        date, hour = _utils.get_date_hour()
+        values_dict = self._serialize_values(None, date, hour)
+
+        idn = await _mongodatabase_async.db_save(
+            self._get_async_client(), self.database_name,
+            self.collection_name, values_dict)
+        self._clear_field_names_cache()
+
+        setattr(self, self._db_spec.reverse_db_dict['id'], idn)
+        return idn
+
+    async def db_read(self, idn=None):
+        """Read a document (collection entry) from database.
+
+        Args:
+            idn (int, optional): entry id (returns last id if not specified).
+
+        Returns:
+            True if update was successful, False otherwise.
+
+        """
+        if not self.mongo:
+            return super().db_read(idn=idn)
+
+        values_dict = await _mongodatabase_async.db_read(
+            self._get_async_client(), self.database_name,
+            self.collection_name, idn=idn)
+
+        if len(values_dict) == 0:
+            return False
+
+        self._set_values(values_dict, await self._async_get_field_names())
+        return True
+
+    async def db_update(self, idn):
+        """Update a collection's document from database.
+
+        Args:
+            idn (int): entry id.
+
+        Returns:
+            True if update was sucessful, False if update failed.
+
+        """
+        if not self.mongo:
+            return super().db_update(idn)
+
+        self._check_field_names(await self._async_get_field_names())
+
+        date, hour = _utils.get_date_hour()
+        values_dict = self._serialize_values(idn, date, hour)
+
+        return await _mongodatabase_async.db_update(
+            self._get_async_client(), self.database_name,
+            self.collection_name, values_dict, idn)
 
 
 class DatabaseAndFileDocument(DatabaseDocument):
@@ -769,8 +1174,9 @@ class DatabaseAndFileDocument(DatabaseDocument):
 
         """
         flines = _utils.read_file(filename)
-        for attr in self.db_dict:
-            value = _utils.find_value(flines, attr, raise_error=False)
+        values = _utils.find_values(flines)
+        for attr, _, _, _ in self._db_spec.items:
+            value = values.get(attr)
             try:
                 setattr(self, attr, value)
             except Exception:
@@ -780,11 +1186,8 @@ class DatabaseAndFileDocument(DatabaseDocument):
         if sep_idx is not None:
             attrs = flines[sep_idx-1].split()
 
-            data = []
-            for line in flines[sep_idx+1:]:
-                data_line = [float(d) for d in line.split('\t')]
-                data.append(data_line)
-            data = _np.array(data)
+            data = _np.loadtxt(
+                flines[sep_idx+1:], delimiter='\t', dtype=float, ndmin=2)
 
             if len(attrs) == data.shape[1]:
                 for idx, attr in enumerate(attrs):
@@ -818,77 +1221,65 @@ class DatabaseAndFileDocument(DatabaseDocument):
         if columns is None:
             columns = []
 
-        date, hour = _utils.get_date_hour()
+        spec = self._db_spec
+        set_date = spec.has_date and self.date is None
+        set_hour = spec.has_hour and self.hour is None
+        if set_date or set_hour:
+            date, hour = _utils.get_date_hour()
 
-        if hasattr(self, 'date') and self.date is None:
-            self.date = date
+            if set_date:
+                self.date = date
 
-        if hasattr(self, 'hour') and self.hour is None:
-            self.hour = hour
+            if set_hour:
+                self.hour = hour
 
-        with open(filename, mode='w') as f:
-            if len(self.label) != 0:
-                line = "{0:s} {1:s}\n\n".format(
-                    _utils.COMMENT_CHAR, self.label)
-                f.write(line)
+        lines = []
+        if len(self.label) != 0:
+            lines.append("{0:s} {1:s}\n\n".format(
+                _utils.COMMENT_CHAR, self.label))
 
-            for attr in self.db_dict:
-                if attr not in columns:
-                    value = getattr(self, attr)
+        fmtstr = '{0:s}\t{1}\n'
+        for attr, _, dtype, _ in self._db_spec.items:
+            if attr not in columns:
+                value = getattr(self, attr)
 
-                    if value is None:
-                        value = _utils.EMPTY_STR
+                if value is None:
+                    value = _utils.EMPTY_STR
 
-                    else:
-                        if 'dtype' in self.db_dict[attr].keys():
-                            dtype = self.db_dict[attr]['dtype']
-                        else:
-                            dtype = _utils.DEFAULT_DTYPE
-
-                        if dtype in (_np.ndarray, list, tuple, dict):
-                            if dtype == _np.ndarray:
-                                value = value.tolist()
-                            value = _json.dumps(value).replace(' ', '')
-                        elif dtype == str:
-                            if len(value) == 0:
-                                value = _utils.EMPTY_STR
-                            value = value.replace(' ', '_')
-
-                    line = '{0:s}\t{1}\n'.format(attr.ljust(30), value)
-                    f.write(line)
+                else:
+                    if dtype in (_np.ndarray, list, tuple, dict):
+                        value = _utils.json_dumps(value).replace(' ', '')
+                    elif dtype == str:
+                        if len(value) == 0:
+                            value = _utils.EMPTY_STR
+                        value = value.replace(' ', '_')
 
-            if len(columns) != 0:
-                columns_values = []
-                for attr in columns:
-                    columns_values.append(getattr(self, attr))
+                lines.append(fmtstr.format(attr.ljust(30), value))
 
-                columns_header = '\t'.join(columns)
-                columns_values = _np.column_stack(columns_values)
+        if len(columns) != 0:
+            columns_values = []
+            for attr in columns:
+                columns_values.append(getattr(self, attr))
 
-                f.write('\n')
-                f.write('%s\n' % columns_header)
-                f.write('--------------------------------------------' +
-                        '--------------------------------------------\n')
+            columns_header = '\t'.join(columns)
+            columns_values = _np.column_stack(columns_values)
 
-                for i in range(columns_values.shape[0]):
-                    line = ''
-                    for j in range(columns_values.shape[1]):
-                        line = line + '{0:+0.10e}\t'.format(
-                            columns_values[i, j])
-                    f.write(line.strip() + '\n')
+            lines.append('\n')
+            lines.append('%s\n' % columns_header)
+            lines.append('--------------------------------------------' +
+                         '--------------------------------------------\n')
+
+        with open(filename, mode='w') as f:
+            f.write(''.join(lines))
+            if len(columns) != 0:
+                _np.savetxt(
+                    f, columns_values, fmt='%+0.10e', delimiter='\t')
 
         return True
 
     def valid_data(self):
         """Check if parameters are valid."""
-        values = []
-        for name in self.db_dict:
-            if 'not_null' in self.db_dict[name].keys():
-                not_null = self.db_dict[name]['not_null']
-            else:
-                not_null = _utils.DEFAULT_NOT_NULL
-
-            if not_null and name not in ['idn', 'date', 'hour']:
-                values.append(getattr(self, name))
-
-        return all([v is not None for v in values])
+        for name in self._db_spec.not_null_attrs:
+            if getattr(self, name) is None:
+                return False
+        return True
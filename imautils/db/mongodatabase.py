@@ -1,11 +1,89 @@
 """MongoDB interface module."""
 
+import re as _re
+import time as _time
+import atexit as _atexit
+import datetime as _datetime
+import threading as _threading
+import operator as _operator
+import functools as _functools
+import importlib.util as _importlib_util
+import bson as _bson
 import numpy as _np
 import pymongo as _pymongo
 
 from . import utils as _utils
 
 
+ITER_PAGE_SIZE = 512
+CLIENT_OPTIONS = {
+    'appname': 'imautils',
+    'maxPoolSize': 50,
+    'minPoolSize': 5,
+    'maxIdleTimeMS': 300000,
+    }
+SEARCH_BATCH_SIZE = 1000
+VALUES_BATCH_SIZE = 5000
+COUNTERS_COLLECTION = '_counters'
+COLLECTION_NAMES_CACHE_TTL = 5  # [s]
+FIELD_TYPES_CACHE_TTL = 30  # [s]
+
+# The BSON types of the last document's fields, computed by the server so
+# that large field values are not transferred.
+_FIELD_TYPES_PIPELINE = [
+    {'$sort': {'_id': -1}},
+    {'$limit': 1},
+    {'$project': {
+        '_id': 0,
+        'types': {'$arrayToObject': {'$map': {
+            'input': {'$objectToArray': '$$ROOT'},
+            'as': 'kv',
+            'in': {'k': '$$kv.k', 'v': {'$cond': [
+                {'$and': [
+                    {'$eq': [{'$type': '$$kv.v'}, 'object']},
+                    {'$eq': ['$$kv.v.__ndarray__', True]},
+                    ]},
+                'ndarray',
+                {'$type': '$$kv.v'},
+                ]}},
+            }}},
+        }},
+    ]
+# BSON type names, and 'ndarray' for the documents of ndarray_to_bson.
+_BSON_TYPES = {
+    'double': float,
+    'string': str,
+    'object': dict,
+    'array': list,
+    'binData': bytes,
+    'objectId': _bson.ObjectId,
+    'bool': bool,
+    'date': _datetime.datetime,
+    'null': type(None),
+    'int': int,
+    'long': int,
+    'decimal': _bson.Decimal128,
+    'ndarray': _np.ndarray,
+    }
+
+_FILTER_OPERATORS = {
+    '=': '$eq',
+    '!=': '$ne',
+    '<>': '$ne',
+    '>': '$gt',
+    '>=': '$gte',
+    '<': '$lt',
+    '<=': '$lte',
+    }
+_FILTER_OPERATOR = _re.compile(r'^(>=|<=|<>|!=|>|<|=)(.*)$')
+
+_clients = []
+_collections_cache = {}
+_database_names_cache = {}
+_field_types_cache = {}
+_collections_lock = _threading.Lock()
+
+
 class MongoDatabaseError(Exception):
     """Monog database exception."""
 
@@ -14,14 +92,158 @@ class MongoDatabaseError(Exception):
         self.message = message
 
 
+def ndarray_to_bson(value):
+    """Convert a numpy array to a BSON document with its raw data.
+
+    Object arrays, which have no raw data representation, are converted
+    to lists. The read functions of this module convert the documents
+    back to numpy arrays.
+
+    Args:
+        value (ndarray): numpy array.
+
+    Returns:
+        a dict with the array dtype, shape and binary data, or a list.
+
+    """
+    if value.dtype.hasobject:
+        return value.tolist()
+
+    return {
+        '__ndarray__': True,
+        'dtype': value.dtype.str,
+        'shape': list(value.shape),
+        'data': _bson.Binary(value.tobytes()),
+        }
+
+
+def bson_to_ndarray(value):
+    """Convert a BSON document created by ndarray_to_bson to a numpy array.
+
+    Args:
+        value (dict): dict with the array dtype, shape and binary data.
+
+    Returns:
+        a writable numpy array.
+
+    """
+    return _np.frombuffer(
+        value['data'], dtype=value['dtype']).reshape(value['shape']).copy()
+
+
+def is_bson_ndarray(value):
+    """Return True if value is a BSON document created by ndarray_to_bson."""
+    return isinstance(value, dict) and value.get('__ndarray__') is True
+
+
+def _decode_value(value):
+    """Convert a value created by ndarray_to_bson to a numpy array."""
+    if is_bson_ndarray(value):
+        return bson_to_ndarray(value)
+    return value
+
+
+def _decode_document(doc):
+    """Convert the document values created by ndarray_to_bson in place.
+
+    Returns:
+        the document, with numpy arrays instead of the BSON documents.
+
+    """
+    for key, value in doc.items():
+        if is_bson_ndarray(value):
+            doc[key] = bson_to_ndarray(value)
+    return doc
+
+
+def _is_cached_collection(client, database_name, collection_name):
+    """Return True if the collection was found recently."""
+    key = (id(client), database_name, collection_name)
+    with _collections_lock:
+        timestamp = _collections_cache.get(key)
+
+    return (
+        timestamp is not None and
+        _time.monotonic() - timestamp < COLLECTION_NAMES_CACHE_TTL)
+
+
+def _cache_collection(client, database_name, collection_name):
+    """Record that the collection exists."""
+    key = (id(client), database_name, collection_name)
+    with _collections_lock:
+        _collections_cache[key] = _time.monotonic()
+
+
+def _get_database_names(client):
+    """Return the database names, listed at most once per cache TTL."""
+    with _collections_lock:
+        timestamp, names = _database_names_cache.get(id(client), (None, None))
+
+    if (
+            timestamp is not None and
+            _time.monotonic() - timestamp < COLLECTION_NAMES_CACHE_TTL):
+        return names
+
+    names = frozenset(client.list_database_names())
+    with _collections_lock:
+        _database_names_cache[id(client)] = (_time.monotonic(), names)
+    return names
+
+
+def _get_compressors():
+    """Return the wire compressors supported by the installed modules."""
+    compressors = []
+    for compressor, module in (('zstd', 'zstandard'), ('snappy', 'snappy')):
+        if _importlib_util.find_spec(module) is not None:
+            compressors.append(compressor)
+    return compressors
+
+
+@_functools.lru_cache(maxsize=None)
+def _get_client(server):
+    """Return the MongoClient instance shared by all server users."""
+    options = dict(CLIENT_OPTIONS)
+    compressors = _get_compressors()
+    if len(compressors) != 0:
+        options['compressors'] = compressors
+    client = _pymongo.MongoClient(server, **options)
+    _clients.append(client)
+    return client
+
+
 def db_connect(server='localhost'):
     """Connect to a MongoDB server.
 
+    The MongoClient is created once per server, with CLIENT_OPTIONS, and
+    reused by subsequent calls, since it already keeps a connection pool.
+    Wire compression is enabled if zstandard or python-snappy is installed.
+    The clients are closed at exit by close_clients.
+
     Returns:
         a MongoClient instance.
 
     """
-    return _pymongo.MongoClient(server)
+    return _get_client(server)
+
+
+def close_clients():
+    """Close the MongoClient instances shared by db_connect.
+
+    Intended for shutdown: subsequent db_connect calls create new clients.
+    """
+    with _collections_lock:
+        _get_client.cache_clear()
+        clients = list(_clients)
+        _clients.clear()
+        _collections_cache.clear()
+        _database_names_cache.clear()
+        _field_types_cache.clear()
+
+    for client in clients:
+        client.close()
+
+
+_atexit.register(close_clients)
 
 
 def db_database_exists(client, database_name):
@@ -43,7 +265,14 @@ def db_database_exists(client, database_name):
         msg = 'Invalid database name.'
         raise MongoDatabaseError(msg)    
     
-    return database_name in client.list_database_names()
+    # Only positive lookups are served from the cache, so a database
+    # created since the names were listed is found.
+    if database_name in _get_database_names(client):
+        return True
+
+    with _collections_lock:
+        _database_names_cache.pop(id(client), None)
+    return database_name in _get_database_names(client)
 
 
 def db_get_collections(client, database_name):
@@ -61,12 +290,18 @@ def db_get_collections(client, database_name):
         msg = 'Database not found.'
         raise MongoDatabaseError(msg)
     
-    return client[database_name].list_collection_names()
+    return client[database_name].list_collection_names(
+        filter={'name': {'$ne': COUNTERS_COLLECTION}},
+        authorizedCollections=True)
 
 
 def db_collection_exists(client, database_name, collection_name):
     """Check if collection exists in database.
 
+    Collections found are remembered for COLLECTION_NAMES_CACHE_TTL
+    seconds, since this check runs before every collection access. Other
+    collections are looked up by name, without listing the database.
+
     Args:
         client (MongoClient): a MongoClient instance.
         database_name (str): database name.
@@ -79,11 +314,34 @@ def db_collection_exists(client, database_name, collection_name):
     if collection_name is None or len(collection_name) == 0:
         msg = 'Invalid collection name.'
         raise MongoDatabaseError(msg)
-    
-    if not db_database_exists(client, database_name):
+
+    if not isinstance(client, _pymongo.MongoClient):
+        msg = 'Invalid mongo client.'
+        raise MongoDatabaseError(msg)
+
+    if database_name is None or len(database_name) == 0:
+        msg = 'Invalid database name.'
+        raise MongoDatabaseError(msg)
+
+    if _is_cached_collection(client, database_name, collection_name):
+        return True
+
+    _names = client[database_name].list_collection_names(
+        filter={'name': collection_name})
+    if collection_name not in _names:
         return False
-    
-    return collection_name in client[database_name].list_collection_names()
+
+    _cache_collection(client, database_name, collection_name)
+    return True
+
+
+def _resolve_collection(client, database_name, collection_name):
+    """Return the collection, raising an error if it does not exist."""
+    if not db_collection_exists(client, database_name, collection_name):
+        msg = 'Database collection not found.'
+        raise MongoDatabaseError(msg)
+
+    return client[database_name][collection_name]
 
 
 def db_create_collection(client, database_name, collection_name):
@@ -98,11 +356,21 @@ def db_create_collection(client, database_name, collection_name):
         True if successful, False otherwise.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        _db = client[database_name]
-        _col = getattr(_db, collection_name)
-        _col.create_index([('id', _pymongo.ASCENDING)], unique=True)
-    
+    if database_name is None or len(database_name) == 0:
+        msg = 'Invalid database name.'
+        raise MongoDatabaseError(msg)
+
+    if collection_name is None or len(collection_name) == 0:
+        msg = 'Invalid collection name.'
+        raise MongoDatabaseError(msg)
+
+    # create_index is a no-op if the index exists, so the collection
+    # existence (possibly cached) does not need to be checked first.
+    _db = client[database_name]
+    _col = getattr(_db, collection_name)
+    _col.create_index([('id', _pymongo.ASCENDING)], unique=True)
+    _cache_collection(client, database_name, collection_name)
+
     return True
 
 
@@ -124,20 +392,13 @@ def db_get_field_names(client, database_name, collection_name):
         a list with the last document's field names.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
+    _doc = _col.find_one(sort=[('_id', _pymongo.DESCENDING)])
+
+    if _doc is None:
         return []
 
-    _cursor = _col.find().sort('_id', _pymongo.DESCENDING)
-    _doc = _cursor.next()
-    _cursor.close()
     _list = list(_doc.keys())
     _list.remove('_id')
 
@@ -162,25 +423,68 @@ def db_get_field_types(client, database_name, collection_name):
         a dict with field names and types.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
+    with _col.aggregate(_FIELD_TYPES_PIPELINE) as _cursor:
+        _docs = list(_cursor)
+
+    if len(_docs) == 0:
         return {}
 
-    _cursor = _col.find().sort('_id', _pymongo.DESCENDING)
-    _doc = _cursor.next()
-    _cursor.close()
+    return _get_field_types(_docs[0]['types'])
+
+
+def _get_cached_field_types(client, database_name, collection_name):
+    """Return db_get_field_types, reused for FIELD_TYPES_CACHE_TTL seconds.
 
-    _field_types = {}
-    for _field in _doc:
-        _field_types[_field] = type(_doc[_field])
-    return _field_types
+    The cache entry is cleared when the collection is changed through this
+    module. Empty results are not cached.
+    """
+    field_types = _lookup_field_types(client, database_name, collection_name)
+    if field_types is None:
+        field_types = db_get_field_types(
+            client, database_name, collection_name)
+        _cache_field_types(
+            client, database_name, collection_name, field_types)
+    return field_types
+
+
+def _lookup_field_types(client, database_name, collection_name):
+    """Return the cached field types of a collection, or None."""
+    key = (id(client), database_name, collection_name)
+    with _collections_lock:
+        timestamp, field_types = _field_types_cache.get(key, (None, None))
+
+    if (
+            timestamp is not None and
+            _time.monotonic() - timestamp < FIELD_TYPES_CACHE_TTL):
+        return field_types
+
+    return None
+
+
+def _cache_field_types(client, database_name, collection_name, field_types):
+    """Record the field types of a collection, if not empty."""
+    if len(field_types) == 0:
+        return
+
+    key = (id(client), database_name, collection_name)
+    with _collections_lock:
+        _field_types_cache[key] = (_time.monotonic(), field_types)
+
+
+def _clear_cached_field_types(client, database_name, collection_name):
+    """Discard the cached field types of a collection."""
+    key = (id(client), database_name, collection_name)
+    with _collections_lock:
+        _field_types_cache.pop(key, None)
+
+
+def _get_field_types(bson_types):
+    """Convert a dict of BSON type names to a dict of Python types."""
+    return {
+        _field: _BSON_TYPES.get(_type, object)
+        for _field, _type in bson_types.items()}
 
 
 def db_get_first_id(client, database_name, collection_name):
@@ -195,20 +499,13 @@ def db_get_first_id(client, database_name, collection_name):
         an id.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
-        return None
+    _doc = _col.find_one(
+        sort=[('id', _pymongo.ASCENDING)], projection={'id': 1, '_id': 0})
 
-    _cursor = _col.find().sort('_id', _pymongo.ASCENDING)
-    _doc = _cursor.next()
-    _cursor.close()
+    if _doc is None:
+        return None
 
     return _doc['id']
 
@@ -225,20 +522,23 @@ def db_get_last_id(client, database_name, collection_name):
         an id.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    return _get_last_id(_col)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
-        return None
 
-    _cursor = _col.find().sort('_id', _pymongo.DESCENDING)
-    _doc = _cursor.next()
-    _cursor.close()
+def _get_last_id(collection):
+    """Return the last document's id, or None if empty.
+
+    The server sorts with the id index created by db_create_collection, if
+    it exists. No hint is given, so saving also works on collections
+    created without the index.
+    """
+    _doc = collection.find_one(
+        sort=[('id', _pymongo.DESCENDING)], projection={'id': 1, '_id': 0})
+
+    if _doc is None:
+        return None
 
     return _doc['id']
 
@@ -256,64 +556,77 @@ def db_delete(client, database_name, collection_name, idns):
         True if successful, False otherwise.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if idns is None or len(idns) == 0:
         msg = 'Invalid document ids.'
         raise MongoDatabaseError(msg)    
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
-        return False
-    
     result =_col.delete_many({'id': { '$in': idns}})
+    _clear_cached_field_types(client, database_name, collection_name)
     if result.deleted_count == len(idns):
         return True
     else:
         return False
 
 
-def db_get_values(client, database_name, collection_name, field):
+def db_get_values(
+        client, database_name, collection_name, field, batch_size=None,
+        distinct=False):
     """Return field values of the database table.
 
+    With distinct the unique values are computed by the server, with the
+    distinct command, which is limited to a 16 MB result. Larger results
+    are grouped by an aggregation instead.
+
     Args:
         client (MongoClient): a MongoClient instance.
         database_name (str): database name.
         collection_name (str): database collection name.
         field (str): string containing the field name.
+        batch_size (int, optional): number of documents per cursor batch
+            (VALUES_BATCH_SIZE if not specified).
+        distinct (bool, optional): if True, return each value only once.
 
     Returns:
         a list of field values.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if field is None or len(field) == 0:
         msg = 'Invalid field name.'
         raise MongoDatabaseError(msg)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
-        return []
-         
-    _cursor = _col.find(projection=[field])
-    _docs = list(_cursor)
-    _values = [doc[field] for doc in _docs]
-    _cursor.close()
+    if distinct:
+        return _get_distinct_values(_col, field)
+
+    if batch_size is None:
+        batch_size = VALUES_BATCH_SIZE
+
+    with _col.find(
+            projection={field: 1, '_id': 0}, batch_size=batch_size) as _cursor:
+        _values = list(map(
+            _decode_value, map(_operator.itemgetter(field), _cursor)))
 
     return _values
 
 
+def _get_distinct_values(collection, field):
+    """Return the unique values of a field, computed by the server."""
+    try:
+        return list(map(_decode_value, collection.distinct(field)))
+    except _pymongo.errors.OperationFailure:
+        pass
+
+    _pipeline = [
+        {'$match': {field: {'$exists': True}}},
+        {'$group': {'_id': '$' + field}},
+        ]
+    with collection.aggregate(_pipeline, allowDiskUse=True) as _cursor:
+        return [_decode_value(doc['_id']) for doc in _cursor]
+
+
 def db_get_value(client, database_name, collection_name, field, idn):
     """Get field value from entry id.
 
@@ -328,9 +641,7 @@ def db_get_value(client, database_name, collection_name, field, idn):
         the parameter value.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if field is None or len(field) == 0:
         msg = 'Invalid field name.'
@@ -340,20 +651,48 @@ def db_get_value(client, database_name, collection_name, field, idn):
         msg = 'Invalid id number.'
         raise MongoDatabaseError(msg)  
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
-        return None
+    _doc = _col.find_one(
+        {'id': idn}, projection={field: 1, '_id': 0}, hint=[('id', 1)])
 
-    try:
-        _doc = _col.find_one({'id': idn})
-        return _doc[field]
-    
-    except Exception:
+    if _doc is None:
         return None
 
+    return _decode_value(_doc.get(field))
+
+
+def db_get_value_in(client, database_name, collection_name, field, idns):
+    """Get field values of several document ids with a single query.
+
+    Args:
+        client (MongoClient): a MongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        field (str): field name.
+        idns (list): list of document ids.
+
+    Returns:
+        a dict with document ids and parameter values. Ids not found in the
+        collection are not included.
+
+    """
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    if field is None or len(field) == 0:
+        msg = 'Invalid field name.'
+        raise MongoDatabaseError(msg)
+
+    if idns is None or None in idns:
+        msg = 'Invalid id numbers.'
+        raise MongoDatabaseError(msg)
+
+    _projection = {'id': 1, field: 1, '_id': 0}
+    with _col.find(
+            {'id': {'$in': list(idns)}}, projection=_projection) as _cursor:
+        _values = {
+            _doc['id']: _decode_value(_doc.get(field)) for _doc in _cursor}
+
+    return _values
+
 
 def db_search_field(client, database_name, collection_name, field, value):
     """Search field in database collection.
@@ -369,9 +708,7 @@ def db_search_field(client, database_name, collection_name, field, value):
         a list of dicts with database entries.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if field is None or len(field) == 0:
         msg = 'Invalid field name.'
@@ -381,20 +718,155 @@ def db_search_field(client, database_name, collection_name, field, value):
         msg = 'Invalid value to search.'
         raise MongoDatabaseError(msg)  
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
+    with _col.find({field: value}) as _cursor:
+        _docs = list(map(_decode_document, _cursor))
     
-    if _count == 0:
-        return []
+    return _docs
+
+
+def db_search_field_in(client, database_name, collection_name, field, values):
+    """Search several values of a field in database collection.
+
+    Args:
+        client (MongoClient): a MongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        field (str): field to search.
+        values (list): list of values to search.
+
+    Returns:
+        a list of dicts with database entries.
+
+    """
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    if field is None or len(field) == 0:
+        msg = 'Invalid field name.'
+        raise MongoDatabaseError(msg)
+
+    if values is None or any(value is None for value in values):
+        msg = 'Invalid values to search.'
+        raise MongoDatabaseError(msg)
+
+    with _col.find({field: {'$in': list(values)}}) as _cursor:
+        _docs = list(map(_decode_document, _cursor))
 
-    _cursor = _col.find({field: value})
-    _docs = list(_cursor)
-    _cursor.close()
-    
     return _docs
 
 
+def _get_search_filter(fields, filters_list, field_types):
+    """Build the find filter for db_search_collection.
+
+    A filter is a range ('min~max'), a comparison starting with one of
+    the _FILTER_OPERATORS, or a value (a regex for str fields).
+
+    Args:
+        fields (list): list of field names to filter.
+        filters_list (list): list of filter strings.
+        field_types (dict): dict with field names and types.
+
+    Returns:
+        a dict with the MongoDB filter.
+
+    """
+    _filters_dict = {}
+    for i, _f in enumerate(filters_list):
+        _data_type = field_types[fields[i]]
+        _f = _f.replace(' ', '')
+
+        if '~' in _f:
+            _split = _f.split('~')
+            _filters_dict[fields[i]] = {
+                '$gte': float(_split[0]),
+                '$lte': float(_split[1])}
+            continue
+
+        _match = _FILTER_OPERATOR.match(_f)
+        if _match is not None:
+            _operator = _FILTER_OPERATORS[_match.group(1)]
+            _split = _match.group(2)
+        else:
+            if _data_type is str:
+                _operator = '$regex'
+            else:
+                _operator = '$eq'
+            _split = _f
+
+        if len(_split) != 0:
+            if 'none' in _split.lower():
+                _value = None
+            else:
+                _value = _data_type(_split)
+            _filters_dict[fields[i]] = {_operator: _value}
+
+    return _filters_dict
+
+
+def _add_initial_idn(filters_dict, initial_idn):
+    """Restrict a find filter to the ids greater or equal to initial_idn.
+
+    A lower bound already set by an id range filter is kept if it is
+    greater than initial_idn.
+    """
+    if initial_idn is None:
+        return
+
+    _id_filter = filters_dict.setdefault('id', {})
+    if _id_filter.get('$gte') is None or _id_filter['$gte'] < initial_idn:
+        _id_filter['$gte'] = initial_idn
+
+
+def _get_find_options(
+        fields, filters, field_types, initial_idn=None, max_nr_lines=None):
+    """Build the Collection.find arguments of a collection search.
+
+    The documents are sorted by ascending id, unless only the last
+    max_nr_lines documents are wanted (no initial_idn). These are sorted by
+    descending id, and must be reversed by the caller.
+
+    Args:
+        fields (list): list of field names to filter.
+        filters (list): list of filters to apply (must have the same
+                        lengh as 'fields').
+        field_types (dict): dict with field names and types.
+        initial_idn (int, optional): initial id to start filter.
+        max_nr_lines (int, optional): maximum number of lines.
+
+    Returns:
+        a dict with the filter, projection, sort, limit and batch_size
+        arguments.
+
+    """
+    if filters is None or len(filters) == 0:
+        filters_list = []
+    else:
+        filters_list = [str(f) for f in filters]
+
+    _filters_dict = _get_search_filter(fields, filters_list, field_types)
+    _add_initial_idn(_filters_dict, initial_idn)
+
+    _projection = {field: 1 for field in fields}
+    _projection['_id'] = 0
+
+    if max_nr_lines is None:
+        _limit = 0
+    else:
+        _limit = max_nr_lines
+
+    if _limit == 0 or initial_idn is not None:
+        _sort = _pymongo.ASCENDING
+    else:
+        _sort = _pymongo.DESCENDING
+
+    return {
+        'filter': _filters_dict,
+        'projection': _projection,
+        'sort': [('id', _sort)],
+        'limit': _limit,
+        'batch_size': min(_limit or SEARCH_BATCH_SIZE, SEARCH_BATCH_SIZE),
+        }
+
+
 def db_search_collection(
         client, database_name, collection_name, fields=None, filters=None,
         initial_idn=None, max_nr_lines=None):
@@ -414,115 +886,179 @@ def db_search_collection(
         a list of dicts with database entries.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if fields is None or len(fields) == 0:
         fields = db_get_field_names(client, database_name, collection_name)
     
     if isinstance(fields, str):
         fields = [fields]
-    
-    filter_dict = {
-        '=': '$eq',
-        '!=': '$ne',
-        '<>': '$ne',
-        '>': '$gt',
-        '>=': '$gte',
-        '<': '$lt',
-        '<=': '$lte',
-    }
-
-    if filters is None or len(filters) == 0:
-        filters_list = []
-    else:
-        filters_list = [str(f) for f in filters]
 
     if max_nr_lines == 0:
         return []
-    
-    if max_nr_lines is None:
-        _limit = 0
-    else:
-        _limit = max_nr_lines    
-    
-    _min = None
-    if initial_idn is not None:
-        _min = {'id': initial_idn}
 
-    _field_types = db_get_field_types(client, database_name, collection_name)
+    _field_types = _get_cached_field_types(
+        client, database_name, collection_name)
     if len(_field_types) == 0:
         return []
-    
-    _filters_dict = {}
-    for i, _f in enumerate(filters_list):
-        _data_type = _field_types[fields[i]]
-        _f = _f.replace(' ', '')
 
-        _split_str = None
-        if '~' in _f:
-            _split_str = '~'
-            _split = _f.split('~')
-            _filters_dict[fields[i]] = {
-                '$gte': float(_split[0]),
-                '$lte': float(_split[1])}
-        elif '>=' in _f:
-            _split_str = '>='
-        elif '<=' in _f:
-            _split_str = '<='
-        elif '<>' in _f:
-            _split_str = '<>'
-        elif '>' in _f:
-            _split_str = '>'
-        elif '<' in _f:
-            _split_str = '<'
-        elif '!=' in _f:
-            _split_str = '!='
-        elif '=' in _f:
-            _split_str = '='
-
-        if _split_str != '~':
-            if _split_str is not None:
-                _operator = filter_dict[_split_str]
-                _split = _f.split(_split_str)[1]
-            else:
-                if _data_type is str:
-                    _operator = '$regex'
-                else:
-                    _operator = '$eq'
-                _split = _f
-
-            if len(_split) != 0:
-                if 'none' in _split.lower():
-                    _value = None
-                else:
-                    _value = _data_type(_split)
-                _filters_dict[fields[i]] = {_operator: _value}
+    _options = _get_find_options(
+        fields, filters, _field_types, initial_idn, max_nr_lines)
+    with _col.find(**_options) as _cursor:
+        _docs = list(map(_decode_document, _cursor))
+
+    if _options['sort'][0][1] == _pymongo.DESCENDING:
+        _docs.reverse()
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    if len(filters_list) != 0:
-        _cursor = _col.find(
-            projection=fields,
-            filter=_filters_dict,
-            limit=_limit,
-            sort=[('id', -1)],
-            min=_min,
-            hint=[('id', 1)])
-    else:
-        _cursor = _col.find(
-            projection=fields,
-            limit=_limit,
-            sort=[('id', -1)],
-            min=_min,
-            hint=[('id', 1)])
-    _docs = list(_cursor)[::-1]
-    _cursor.close()
-    
     return _docs
 
 
+def db_iter_collection(
+        client, database_name, collection_name, fields=None, filters=None,
+        initial_idn=None, page_size=None):
+    """Iterate over the filtered collection entries, in ascending id order.
+
+    Args:
+        client (MongoClient): a MongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        fields (list): list of field names to filter.
+        filters (list, optional): list of filters to apply (must have the same
+                                  lengh as 'fields').
+        initial_idn (int, optional): initial id to start filter.
+        page_size (int, optional): number of documents per server batch.
+
+    Yields:
+        dicts with database entries.
+
+    """
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    if fields is None or len(fields) == 0:
+        fields = db_get_field_names(client, database_name, collection_name)
+
+    if isinstance(fields, str):
+        fields = [fields]
+
+    _field_types = _get_cached_field_types(
+        client, database_name, collection_name)
+    if len(_field_types) == 0:
+        return
+
+    _options = _get_find_options(fields, filters, _field_types, initial_idn)
+    _options['batch_size'] = page_size or ITER_PAGE_SIZE
+    _cursor = _col.find(**_options)
+    try:
+        for _doc in _cursor:
+            yield _decode_document(_doc)
+    finally:
+        _cursor.close()
+
+
+def db_get_columns(
+        client, database_name, collection_name, fields=None, filters=None):
+    """Get the filtered collection entries as one array per field.
+
+    Args:
+        client (MongoClient): a MongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        fields (list): list of field names to filter.
+        filters (list, optional): list of filters to apply (must have the same
+                                  lengh as 'fields').
+
+    Returns:
+        a dict with field names and numpy arrays of values, in ascending
+        id order. The id field is always included. The values of list,
+        dict and ndarray fields are returned in object arrays.
+
+    """
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    if fields is None or len(fields) == 0:
+        fields = db_get_field_names(client, database_name, collection_name)
+
+    if isinstance(fields, str):
+        fields = [fields]
+
+    field_names = list(fields)
+    if 'id' not in field_names:
+        field_names.insert(0, 'id')
+
+    _field_types = _get_cached_field_types(
+        client, database_name, collection_name)
+    if len(_field_types) == 0:
+        return {field: _np.array([]) for field in field_names}
+
+    _options = _get_find_options(fields, filters, _field_types)
+    _options['projection']['id'] = 1
+    _options['batch_size'] = 4096
+    _cursor = _col.find(**_options)
+
+    _columns = {field: [] for field in field_names}
+    with _cursor:
+        for _doc in _cursor:
+            for field, values in _columns.items():
+                values.append(_doc.get(field))
+
+    return {
+        field: _get_column(values, _field_types.get(field))
+        for field, values in _columns.items()}
+
+
+def _get_column(values, field_type):
+    """Convert the values of a field to a numpy array.
+
+    The values of list, dict and ndarray fields, which may have different
+    lengths, are kept as the elements of an object array.
+    """
+    if field_type not in (list, dict, _np.ndarray):
+        return _np.array(values)
+
+    _column = _np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        _column[i] = _decode_value(value)
+    return _column
+
+
+def _allocate_ids(db, collection_name, count):
+    """Reserve consecutive ids for new documents of a collection.
+
+    The ids are taken from a sequence stored in COUNTERS_COLLECTION, which
+    is incremented atomically, so concurrent writers never get the same
+    id. The sequence starts at the last id of the collection.
+
+    Args:
+        db (Database): a pymongo Database instance.
+        collection_name (str): database collection name.
+        count (int): number of ids to reserve.
+
+    Returns:
+        the first reserved id.
+
+    """
+    _counters = db[COUNTERS_COLLECTION]
+    for _ in range(2):
+        _doc = _counters.find_one_and_update(
+            {'_id': collection_name}, {'$inc': {'seq': count}},
+            return_document=_pymongo.ReturnDocument.AFTER)
+        if _doc is not None:
+            return _doc['seq'] - count + 1
+        _sync_counter(db, collection_name)
+
+    msg = 'Could not reserve document ids.'
+    raise MongoDatabaseError(msg)
+
+
+def _sync_counter(db, collection_name):
+    """Move the id sequence of a collection up to its last id."""
+    _last = _get_last_id(db[collection_name])
+    if _last is None:
+        _last = 0
+    db[COUNTERS_COLLECTION].update_one(
+        {'_id': collection_name}, {'$max': {'seq': _last}}, upsert=True)
+
+
 def db_save(client, database_name, collection_name, values_dict):
     """Insert a document into a database collection.
 
@@ -536,31 +1072,91 @@ def db_save(client, database_name, collection_name, values_dict):
         The id of the saved database document.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if values_dict is None or len(values_dict) == 0:
         msg = 'Invalid values to save in database.'
         raise MongoDatabaseError(msg)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-
-    if _count == 0:
-        idn = 1
-    else:
-        idn = db_get_last_id(client, database_name, collection_name)
-        idn = idn + 1
+    _db = _col.database
 
     _values = {}
     for key, value in values_dict.items():
         _values[key] = value
-    _values['id'] = idn
 
-    _col.insert_one(_values)
-    return idn
+    # The counter may be behind the collection if documents were saved
+    # without it, so it is synchronized and the insertion retried once.
+    for attempt in range(2):
+        idn = _allocate_ids(_db, collection_name, 1)
+        _values['id'] = idn
+        _values.pop('_id', None)
+        try:
+            _col.insert_one(_values)
+            _clear_cached_field_types(client, database_name, collection_name)
+            return idn
+        except _pymongo.errors.DuplicateKeyError:
+            if attempt != 0:
+                raise
+            _sync_counter(_db, collection_name)
+
+
+def db_save_many(client, database_name, collection_name, values_dicts):
+    """Insert several documents into a database collection.
+
+    Args:
+        client (MongoClient): a MongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        values_dicts (list): list of dicts with values to save in database.
+
+    Returns:
+        a list with the ids of the saved database documents.
+
+    """
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    if values_dicts is None or len(values_dicts) == 0:
+        msg = 'Invalid values to save in database.'
+        raise MongoDatabaseError(msg)
+
+    _db = _col.database
+    _sync_counter(_db, collection_name)
+    first_idn = _allocate_ids(_db, collection_name, len(values_dicts))
+
+    idns = list(range(first_idn, first_idn + len(values_dicts)))
+    documents = []
+    for idn, values_dict in zip(idns, values_dicts):
+        _values = dict(values_dict)
+        _values['id'] = idn
+        _values.pop('_id', None)
+        documents.append(_values)
+
+    # As in db_save, documents whose ids are already taken get new ids
+    # from the synchronized counter and are inserted again, once.
+    pending = list(range(len(documents)))
+    for attempt in range(2):
+        try:
+            _col.insert_many([documents[i] for i in pending], ordered=False)
+            break
+        except _pymongo.errors.BulkWriteError as e:
+            _clear_cached_field_types(client, database_name, collection_name)
+            _errors = e.details.get('writeErrors', [])
+            if (
+                    attempt != 0 or len(_errors) == 0 or
+                    any(error['code'] != 11000 for error in _errors) or
+                    len(e.details.get('writeConcernErrors', [])) != 0):
+                raise
+
+            pending = [pending[error['index']] for error in _errors]
+            _sync_counter(_db, collection_name)
+            first_idn = _allocate_ids(_db, collection_name, len(pending))
+            for idn, i in enumerate(pending, first_idn):
+                idns[i] = idn
+                documents[i]['id'] = idn
+                documents[i].pop('_id', None)
+
+    _clear_cached_field_types(client, database_name, collection_name)
+    return idns
 
 
 def db_read(client, database_name, collection_name, idn=None):
@@ -576,26 +1172,18 @@ def db_read(client, database_name, collection_name, idn=None):
         a dict with values read from database.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-    
-    if _count == 0:
-        return {}
-    
     if idn is not None:
-        _doc = _col.find_one({'id': idn})
+        _doc = _col.find_one({'id': idn}, projection={'_id': 0})
     else:
-        _cursor = _col.find().sort('_id', _pymongo.DESCENDING)
-        _doc = _cursor.next()
-        _cursor.close()
+        _doc = _col.find_one(
+            sort=[('_id', _pymongo.DESCENDING)], projection={'_id': 0})
+
+    if _doc is None:
+        return {}
 
-    _doc.pop('_id', None)
-    return _doc
+    return _decode_document(_doc)
 
 
 def db_update(client, database_name, collection_name, values_dict, idn):
@@ -611,9 +1199,7 @@ def db_update(client, database_name, collection_name, values_dict, idn):
         True if update was sucessful, False if update failed.
 
     """
-    if not db_collection_exists(client, database_name, collection_name):
-        msg = 'Database collection not found.'
-        raise MongoDatabaseError(msg)
+    _col = _resolve_collection(client, database_name, collection_name)
 
     if values_dict is None or len(values_dict) == 0:
         msg = 'Invalid values to save in database.'
@@ -623,19 +1209,54 @@ def db_update(client, database_name, collection_name, values_dict, idn):
         msg = 'Invalid id number.'
         raise MongoDatabaseError(msg)  
 
-    _db = client[database_name]
-    _col = getattr(_db, collection_name)
-    _count = _col.estimated_document_count()
-
-    if _count == 0:
-        return False
-
     _values = {}
     for key, value in values_dict.items():
         _values[key] = value
     _values['id'] = idn
-    
-    _col.update_one({'id': idn},
-                    {'$set': _values})
-    return True
 
+    _result = _col.update_one({'id': idn}, {'$set': _values})
+    _clear_cached_field_types(client, database_name, collection_name)
+    return _result.matched_count > 0
+
+
+def db_update_many(client, database_name, collection_name, values_dicts, idns):
+    """Update several collection's documents in a single bulk write.
+
+    The ids are checked before the bulk write, and no document is updated
+    if an id is not found. Documents deleted by another client between
+    the check and the write are not updated.
+
+    Args:
+        client (MongoClient): a MongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        values_dicts (list): list of dicts with values to save in database.
+        idns (list): list of entry ids.
+
+    Returns:
+        True if all documents were found and updated, False otherwise.
+
+    """
+    _col = _resolve_collection(client, database_name, collection_name)
+
+    if values_dicts is None or len(values_dicts) == 0:
+        msg = 'Invalid values to save in database.'
+        raise MongoDatabaseError(msg)
+
+    if idns is None or len(idns) != len(values_dicts) or None in idns:
+        msg = 'Invalid id numbers.'
+        raise MongoDatabaseError(msg)
+
+    _idns = list(set(idns))
+    if _col.count_documents({'id': {'$in': _idns}}) != len(_idns):
+        return False
+
+    requests = []
+    for idn, values_dict in zip(idns, values_dicts):
+        _values = dict(values_dict)
+        _values['id'] = idn
+        requests.append(_pymongo.UpdateOne({'id': idn}, {'$set': _values}))
+
+    _result = _col.bulk_write(requests, ordered=False)
+    _clear_cached_field_types(client, database_name, collection_name)
+    return _result.matched_count == len(idns)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+
+"""Asynchronous MongoDB interface module."""
+
+import atexit as _atexit
+import asyncio as _asyncio
+import weakref as _weakref
+import pymongo as _pymongo
+
+from .mongodatabase import (
+    MongoDatabaseError, COUNTERS_COLLECTION, _FIELD_TYPES_PIPELINE,
+    _cache_collection, _cache_field_types, _clear_cached_field_types,
+    _decode_document, _get_field_types, _get_find_options,
+    _is_cached_collection, _lookup_field_types)
+
+
+_AsyncMongoClient = getattr(_pymongo, 'AsyncMongoClient', None)
+
+_clients = _weakref.WeakKeyDictionary()
+
+
+def db_connect(server='localhost'):
+    """Connect to a MongoDB server from a running event loop.
+
+    An async client is bound to the event loop where it is first used, so
+    the AsyncMongoClient is created once per server and event loop. All
+    coroutines of the same loop share its connection pool.
+
+    Returns:
+        an AsyncMongoClient instance.
+
+    """
+    if _AsyncMongoClient is None:
+        msg = 'The pymongo async API (pymongo>=4.9) is not available.'
+        raise MongoDatabaseError(msg)
+
+    loop = _asyncio.get_running_loop()
+    loop_clients = _clients.get(loop)
+    if loop_clients is None:
+        loop_clients = {}
+        _clients[loop] = loop_clients
+
+    client = loop_clients.get(server)
+    if client is None:
+        client = _AsyncMongoClient(server)
+        loop_clients[server] = client
+    return client
+
+
+async def close_clients():
+    """Close the AsyncMongoClient instances of the running event loop.
+
+    Must be awaited before the event loop is closed, the clients of other
+    loops are left open. Subsequent db_connect calls create new clients.
+    """
+    loop_clients = _clients.pop(_asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        await client.close()
+
+
+def _close_idle_clients():
+    """Close at exit the clients of event loops that are still usable."""
+    for loop, loop_clients in list(_clients.items()):
+        if loop.is_closed() or loop.is_running():
+            continue
+        for client in loop_clients.values():
+            try:
+                loop.run_until_complete(client.close())
+            except Exception:
+                pass
+    _clients.clear()
+
+
+_atexit.register(_close_idle_clients)
+
+
+async def db_collection_exists(client, database_name, collection_name):
+    """Check if collection exists in database.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+
+    Returns:
+        True if the collection exists, False otherwise.
+
+    """
+    if collection_name is None or len(collection_name) == 0:
+        msg = 'Invalid collection name.'
+        raise MongoDatabaseError(msg)
+
+    if database_name is None or len(database_name) == 0:
+        msg = 'Invalid database name.'
+        raise MongoDatabaseError(msg)
+
+    if _is_cached_collection(client, database_name, collection_name):
+        return True
+
+    _names = await client[database_name].list_collection_names(
+        filter={'name': collection_name})
+    if collection_name not in _names:
+        return False
+
+    _cache_collection(client, database_name, collection_name)
+    return True
+
+
+async def _resolve_collection(client, database_name, collection_name):
+    """Return the collection, raising an error if it does not exist."""
+    if not await db_collection_exists(
+            client, database_name, collection_name):
+        msg = 'Database collection not found.'
+        raise MongoDatabaseError(msg)
+
+    return client[database_name][collection_name]
+
+
+async def _get_last_document(collection):
+    return await collection.find_one(sort=[('_id', _pymongo.DESCENDING)])
+
+
+async def db_get_field_names(client, database_name, collection_name):
+    """Return the field names of the last collection's document.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+
+    Returns:
+        a list with the last document's field names.
+
+    """
+    _col = await _resolve_collection(client, database_name, collection_name)
+    _doc = await _get_last_document(_col)
+    if _doc is None:
+        return []
+
+    _doc.pop('_id', None)
+    return list(_doc.keys())
+
+
+async def db_get_field_types(client, database_name, collection_name):
+    """Return the field types of the last collection's document.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+
+    Returns:
+        a dict with field names and types.
+
+    """
+    _col = await _resolve_collection(client, database_name, collection_name)
+    _cursor = await _col.aggregate(_FIELD_TYPES_PIPELINE)
+    async with _cursor:
+        _docs = await _cursor.to_list(None)
+
+    if len(_docs) == 0:
+        return {}
+
+    return _get_field_types(_docs[0]['types'])
+
+
+async def _get_cached_field_types(client, database_name, collection_name):
+    """Return db_get_field_types, see mongodatabase._get_cached_field_types."""
+    field_types = _lookup_field_types(client, database_name, collection_name)
+    if field_types is None:
+        field_types = await db_get_field_types(
+            client, database_name, collection_name)
+        _cache_field_types(
+            client, database_name, collection_name, field_types)
+    return field_types
+
+
+async def db_get_last_id(client, database_name, collection_name):
+    """Return the last inserted document's id.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+
+    Returns:
+        an id.
+
+    """
+    _col = await _resolve_collection(client, database_name, collection_name)
+    _doc = await _col.find_one(
+        sort=[('id', _pymongo.DESCENDING)], projection={'id': 1, '_id': 0})
+    if _doc is None:
+        return None
+
+    return _doc['id']
+
+
+async def db_search_collection(
+        client, database_name, collection_name, fields=None, filters=None,
+        initial_idn=None, max_nr_lines=None):
+    """Filter collection entries.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        fields (list): list of field names to filter.
+        filters (list, optional): list of filters to apply (must have the same
+                                  lengh as 'fields').
+        initial_idn (int, optional): initial id to start filter.
+        max_nr_lines (int, optional): maximum number of lines.
+
+    Returns:
+        a list of dicts with database entries.
+
+    """
+    _col = await _resolve_collection(client, database_name, collection_name)
+
+    if fields is None or len(fields) == 0:
+        fields = await db_get_field_names(
+            client, database_name, collection_name)
+
+    if isinstance(fields, str):
+        fields = [fields]
+
+    if max_nr_lines == 0:
+        return []
+
+    _field_types = await _get_cached_field_types(
+        client, database_name, collection_name)
+    if len(_field_types) == 0:
+        return []
+
+    _options = _get_find_options(
+        fields, filters, _field_types, initial_idn, max_nr_lines)
+    async with _col.find(**_options) as _cursor:
+        _docs = list(map(_decode_document, await _cursor.to_list(None)))
+
+    if _options['sort'][0][1] == _pymongo.DESCENDING:
+        _docs.reverse()
+
+    return _docs
+
+
+async def _allocate_ids(db, collection_name, count):
+    """Reserve consecutive ids, see mongodatabase._allocate_ids."""
+    _counters = db[COUNTERS_COLLECTION]
+    for _ in range(2):
+        _doc = await _counters.find_one_and_update(
+            {'_id': collection_name}, {'$inc': {'seq': count}},
+            return_document=_pymongo.ReturnDocument.AFTER)
+        if _doc is not None:
+            return _doc['seq'] - count + 1
+        await _sync_counter(db, collection_name)
+
+    msg = 'Could not reserve document ids.'
+    raise MongoDatabaseError(msg)
+
+
+async def _sync_counter(db, collection_name):
+    """Move the id sequence of a collection up to its last id."""
+    _last = await db_get_last_id(db.client, db.name, collection_name)
+    if _last is None:
+        _last = 0
+    await db[COUNTERS_COLLECTION].update_one(
+        {'_id': collection_name}, {'$max': {'seq': _last}}, upsert=True)
+
+
+async def db_save(client, database_name, collection_name, values_dict):
+    """Insert a document into a database collection.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        values_dict (str): dict with values to save in database.
+
+    Returns:
+        The id of the saved database document.
+
+    """
+    if values_dict is None or len(values_dict) == 0:
+        msg = 'Invalid values to save in database.'
+        raise MongoDatabaseError(msg)
+
+    _col = await _resolve_collection(client, database_name, collection_name)
+    _db = _col.database
+    _values = dict(values_dict)
+
+    for attempt in range(2):
+        idn = await _allocate_ids(_db, collection_name, 1)
+        _values['id'] = idn
+        _values.pop('_id', None)
+        try:
+            await _col.insert_one(_values)
+            return idn
+        except _pymongo.errors.DuplicateKeyError:
+            if attempt != 0:
+                raise
+            await _sync_counter(_db, collection_name)
+        finally:
+            _clear_cached_field_types(client, database_name, collection_name)
+
+
+async def db_read(client, database_name, collection_name, idn=None):
+    """Read a document (collection entry) from database.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        idn (int, optional): entry id (returns last id if not specified).
+
+    Returns:
+        a dict with values read from database.
+
+    """
+    _col = await _resolve_collection(client, database_name, collection_name)
+    if idn is not None:
+        _doc = await _col.find_one({'id': idn})
+    else:
+        _doc = await _col.find_one(sort=[('_id', _pymongo.DESCENDING)])
+
+    if _doc is None:
+        return {}
+
+    _doc.pop('_id', None)
+    return _decode_document(_doc)
+
+
+async def db_update(client, database_name, collection_name, values_dict, idn):
+    """Update a collection's document from database.
+
+    Args:
+        client (AsyncMongoClient): an AsyncMongoClient instance.
+        database_name (str): database name.
+        collection_name (str): database collection name.
+        values_dict (str): dict with values to save in database.
+        idn (int): entry id.
+
+    Returns:
+        True if update was sucessful, False if update failed.
+
+    """
+    _col = await _resolve_collection(client, database_name, collection_name)
+
+    if values_dict is None or len(values_dict) == 0:
+        msg = 'Invalid values to save in database.'
+        raise MongoDatabaseError(msg)
+
+    if idn is None:
+        msg = 'Invalid id number.'
+        raise MongoDatabaseError(msg)
+
+    _values = dict(values_dict)
+    _values['id'] = idn
+
+    _result = await _col.update_one({'id': idn}, {'$set': _values})
+    _clear_cached_field_types(client, database_name, collection_name)
+    return _result.matched_count > 0
@@ -3,9 +3,14 @@
 """Implementation of functions to handle sqlite database records."""
 
 import os as _os
+import re as _re
 import sys as _sys
 import json as _json
+import atexit as _atexit
+import contextlib as _contextlib
+import functools as _functools
 import sqlite3 as _sqlite
+import threading as _threading
 import traceback as _traceback
 import numpy as _np
 
@@ -20,6 +25,230 @@ class SqliteDatabaseError(Exception):
         self.message = message
 
 
+SQLITE_MAX_VARIABLES = 500
+COLUMN_TYPES = {
+    'INTEGER': int,
+    'REAL': float,
+    'TEXT': str,
+    'BLOB': bytes,
+    }
+CACHED_STATEMENTS = 256
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-64000',
+    )
+ITER_MIN_PAGE_SIZE = 64
+ITER_MAX_PAGE_SIZE = 4096
+
+_FILTER_OPERATOR = _re.compile(r'^\s*(<=|>=|<>|!=|=|<|>)\s*(\S+)\s*$')
+
+_connections = _threading.local()
+_open_connections = set()
+_open_connections_lock = _threading.Lock()
+_generation = 0
+
+
+class _ConnectionEntry():
+    """Cached connection and the state it was last validated against."""
+
+    def __init__(self, con, file_id, generation):
+        self.con = con
+        self.file_id = file_id
+        self.generation = generation
+        self.schema_version = None
+        self.schemas = {}
+
+
+def _get_connection_cache():
+    cache = getattr(_connections, 'cache', None)
+    if cache is None:
+        cache = {}
+        _connections.cache = cache
+    return cache
+
+
+def _get_file_id(path):
+    try:
+        stat = _os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_ctime_ns)
+
+
+def _close_connection(con):
+    with _open_connections_lock:
+        _open_connections.discard(con)
+    con.close()
+
+
+def _get_connection(database_name):
+    """Get a cached connection to the database file.
+
+    Connections are kept per thread and per database file and are reused
+    between calls. New connections are configured with CONNECTION_PRAGMAS
+    (WAL journal, so readers do not block behind writers, with
+    synchronous=NORMAL). A cached connection is replaced if the database
+    file was deleted or modified by someone else since it was last used,
+    which also discards the table schemas cached with it.
+
+    Args:
+        database_name (str): full file path to database.
+
+    Returns:
+        a sqlite3 connection.
+
+    """
+    return _get_connection_entry(database_name).con
+
+
+def _get_connection_entry(database_name, create=True):
+    """Get the cached connection entry of the current thread.
+
+    Raises SqliteDatabaseError if the database file does not exist and
+    create is False.
+    """
+    cache = _get_connection_cache()
+    key = _os.path.abspath(database_name)
+    file_id = _get_file_id(key)
+
+    entry = cache.get(key)
+    if entry is not None:
+        if (entry.generation == _generation and file_id is not None and
+                file_id == entry.file_id):
+            return entry
+        _close_connection(entry.con)
+        del cache[key]
+
+    if file_id is None and not create:
+        msg = 'Database not found.'
+        raise SqliteDatabaseError(msg)
+
+    # Connections are only used by the thread that created them, but may
+    # be closed by close_all_connections from another thread.
+    con = _sqlite.connect(
+        database_name, check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS)
+    for pragma in CONNECTION_PRAGMAS:
+        con.execute(pragma)
+    with _open_connections_lock:
+        _open_connections.add(con)
+
+    entry = _ConnectionEntry(con, _get_file_id(key), _generation)
+    cache[key] = entry
+    return entry
+
+
+def _release_connection(database_name):
+    """Record the database file state after a write on the connection."""
+    cache = _get_connection_cache()
+    key = _os.path.abspath(database_name)
+    entry = cache.get(key)
+    if entry is not None:
+        entry.file_id = _get_file_id(key)
+
+
+def _get_table_schema(database_name, table_name):
+    """Return the column names and declared types of a table.
+
+    The schema is read with a single PRAGMA TABLE_INFO query and cached
+    with the database connection, until the database schema_version
+    changes.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+
+    Returns:
+        a tuple with column names and a tuple with declared column types.
+
+    """
+    return _get_entry_schema(
+        _get_connection_entry(database_name), table_name)
+
+
+def _get_entry_schema(entry, table_name):
+    """Return the cached schema of a table for a connection entry."""
+    cur = entry.con.cursor()
+
+    cur.execute('PRAGMA schema_version')
+    schema_version = cur.fetchone()[0]
+    if schema_version != entry.schema_version:
+        entry.schemas.clear()
+        entry.schema_version = schema_version
+
+    schemas = entry.schemas
+    schema = schemas.get(table_name)
+    if schema is None:
+        cur.execute("PRAGMA TABLE_INFO({0})".format(table_name))
+        info = cur.fetchall()
+        schema = (tuple(i[1] for i in info), tuple(i[2] for i in info))
+        schemas[table_name] = schema
+    return schema
+
+
+def refresh_schema(database_name, table_name=None):
+    """Discard the cached table schemas of a database.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str, optional): table name (all tables if not given).
+
+    """
+    entry = _get_connection_cache().get(_os.path.abspath(database_name))
+    if entry is None:
+        return
+
+    if table_name is None:
+        entry.schemas.clear()
+    else:
+        entry.schemas.pop(table_name, None)
+
+
+@_functools.lru_cache(maxsize=256)
+def _get_insert_command(table_name, nr_columns):
+    """Return the parameterized INSERT command of a table."""
+    return 'INSERT INTO {0} VALUES ({1})'.format(
+        table_name, ','.join(['?']*nr_columns))
+
+
+@_functools.lru_cache(maxsize=256)
+def _get_update_command(table_name, column_names):
+    """Return the parameterized UPDATE command of a table, by id."""
+    aux_str = ', '.join('`' + column + '`=?' for column in column_names)
+    return 'UPDATE {0} SET {1} WHERE id = ?'.format(table_name, aux_str)
+
+
+def close_connections():
+    """Close the cached database connections of the current thread."""
+    cache = _get_connection_cache()
+    for entry in cache.values():
+        _close_connection(entry.con)
+    cache.clear()
+
+
+def close_all_connections():
+    """Close the cached database connections of all threads.
+
+    Intended for shutdown: other threads reconnect on their next call, but
+    a query running concurrently on a closed connection fails.
+    """
+    global _generation
+    with _open_connections_lock:
+        _generation += 1
+        connections = list(_open_connections)
+        _open_connections.clear()
+
+    for con in connections:
+        con.close()
+    _get_connection_cache().clear()
+
+
+_atexit.register(close_all_connections)
+
+
 def db_database_exists(database_name):
     """Check if database file exists.
 
@@ -51,18 +280,12 @@ def db_get_tables(database_name):
         msg = 'Database not found.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
+    con = _get_connection(database_name)
     cur = con.cursor()
 
-    try:
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        table_names = [r[0] for r in cur.fetchall()]
-        con.close()
-        return table_names
-
-    except Exception as e:
-        con.close()
-        raise e
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    table_names = [r[0] for r in cur.fetchall()]
+    return table_names
 
 
 def db_table_exists(database_name, table_name):
@@ -84,91 +307,83 @@ def db_table_exists(database_name, table_name):
         msg = 'Invalid table name.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
-    cur = con.cursor()
-
-    try:
-        cur.execute("PRAGMA TABLE_INFO({0})".format(table_name))
-        if len(cur.fetchall()) > 0:
-            con.close()
-            return True
-        else:
-            con.close()
-            return False
+    column_names, _ = _get_table_schema(database_name, table_name)
+    if len(column_names) > 0:
+        return True
+    else:
+        return False
 
-    except Exception as e:
-        con.close()
-        raise e
 
+def _get_table(database_name, table_name):
+    """Get the connection and schema of an existing database table.
 
-def db_get_column_names(database_name, table_name):
-    """Return the column names of the database table.
+    Checks the database and the table and reads the table schema with a
+    single lookup of the cached connection, which also tells if the
+    database file exists.
 
     Args:
         database_name (str): full file path to database.
         table_name (str): database table name.
 
     Returns:
-        a list with table column names.
+        the sqlite3 connection, a tuple with column names and a tuple with
+        declared column types.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
+    if database_name is None or len(database_name) == 0:
+        msg = 'Invalid database name.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
-    cur = con.cursor()
+    if table_name is None or len(table_name) == 0 or table_name == 'table':
+        msg = 'Invalid table name.'
+        raise SqliteDatabaseError(msg)
 
-    try:
-        cur.execute("PRAGMA TABLE_INFO({0})".format(table_name))
-        info = cur.fetchall()
-        column_names = [i[1] for i in info]
-        con.close()
-        return column_names
+    entry = _get_connection_entry(database_name, create=False)
+    column_names, declared_types = _get_entry_schema(entry, table_name)
+    if len(column_names) == 0:
+        msg = 'Database table not found.'
+        raise SqliteDatabaseError(msg)
 
-    except Exception as e:
-        con.close()
-        raise e
+    return entry.con, column_names, declared_types
 
 
-def db_get_column_types(database_name, table_name):
-    """Return the column types of the database table.
+def db_get_column_names(database_name, table_name):
+    """Return the column names of the database table.
 
     Args:
         database_name (str): full file path to database.
         table_name (str): database table name.
 
     Returns:
-        a dict with column names and types.
+        a list with table column names.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
+    _, column_names, _ = _get_table(database_name, table_name)
+    return list(column_names)
 
-    db_type_dict = {
-        'INTEGER': int,
-        'REAL': float,
-        'TEXT': str,
-        }
 
-    con = _sqlite.connect(database_name)
-    cur = con.cursor()
+def db_get_column_types(database_name, table_name):
+    """Return the column types of the database table.
 
-    try:
-        cur.execute("PRAGMA TABLE_INFO({0})".format(table_name))
-        info = cur.fetchall()
-        con.close()
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
 
-        column_types = {}
-        for i in info:
-            column_types[i[1]] = db_type_dict[i[2]]
+    Returns:
+        a dict with column names and types.
+
+    """
+    _, column_names, declared_types = _get_table(database_name, table_name)
+    return dict(_get_column_types(column_names, declared_types))
 
-        return column_types
 
-    except Exception as e:
-        con.close()
-        raise e
+@_functools.lru_cache(maxsize=256)
+def _get_column_types(column_names, declared_types):
+    """Return the column types of a table schema (shared, do not modify)."""
+    column_types = {}
+    for name, declared_type in zip(column_names, declared_types):
+        column_types[name] = COLUMN_TYPES[declared_type.split()[0]]
+    return column_types
 
 
 def db_get_first_id(database_name, table_name):
@@ -182,22 +397,12 @@ def db_get_first_id(database_name, table_name):
         an id.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
-
-    con = _sqlite.connect(database_name)
+    con, _, _ = _get_table(database_name, table_name)
     cur = con.cursor()
 
-    try:
-        cur.execute('SELECT MIN(id) FROM {0}'.format(table_name))
-        idn = cur.fetchone()[0]
-        con.close()
-        return idn
-
-    except Exception as e:
-        con.close()
-        raise e
+    cur.execute('SELECT MIN(id) FROM {0}'.format(table_name))
+    idn = cur.fetchone()[0]
+    return idn
 
 
 def db_get_last_id(database_name, table_name):
@@ -211,22 +416,12 @@ def db_get_last_id(database_name, table_name):
         an id.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
-
-    con = _sqlite.connect(database_name)
+    con, _, _ = _get_table(database_name, table_name)
     cur = con.cursor()
 
-    try:
-        cur.execute('SELECT MAX(id) FROM {0}'.format(table_name))
-        idn = cur.fetchone()[0]
-        con.close()
-        return idn
-
-    except Exception as e:
-        con.close()
-        raise e
+    cur.execute('SELECT MAX(id) FROM {0}'.format(table_name))
+    idn = cur.fetchone()[0]
+    return idn
 
 
 def db_delete(database_name, table_name, idns):
@@ -241,63 +436,51 @@ def db_delete(database_name, table_name, idns):
         True if successful, False otherwise.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
+    con, _, _ = _get_table(database_name, table_name)
 
     if idns is None or len(idns) == 0:
         msg = 'Invalid entry ids.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
+    with con:
         seq = ','.join(['?']*len(idns))
         cmd = 'DELETE FROM {0} WHERE id IN ({1})'.format(
             table_name, seq)
         cur.execute(cmd, idns)
-        con.commit()
-        con.close()
-        return True
 
-    except Exception as e:
-        con.close()
-        raise e
+    _release_connection(database_name)
+    return True
 
 
-def db_get_values(database_name, table_name, column):
+def db_get_values(database_name, table_name, column, distinct=False):
     """Return column values of the database table.
 
     Args:
         database_name (str): full file path to database.
         table_name (str): database table name.
         column (str): column name.
+        distinct (bool, optional): if True, return each value only once.
 
     Returns:
         a list with column values.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
+    con, _, _ = _get_table(database_name, table_name)
 
     if column is None or len(column) == 0:
         msg = 'Invalid column name.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
-        cur.execute('SELECT {0} FROM {1}'.format(column, table_name))
-        column = [d[0] for d in cur.fetchall()]
-        con.close()
-        return column
-
-    except Exception as e:
-        con.close()
-        raise e
+    if distinct:
+        cmd = 'SELECT DISTINCT {0} FROM {1}'
+    else:
+        cmd = 'SELECT {0} FROM {1}'
+    cur.execute(cmd.format(column, table_name))
+    return [d[0] for d in cur]
 
 
 def db_get_value(database_name, table_name, column, idn):
@@ -313,9 +496,7 @@ def db_get_value(database_name, table_name, column, idn):
         the parameter value.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
+    con, _, _ = _get_table(database_name, table_name)
 
     if column is None or len(column) == 0:
         msg = 'Invalid column name.'
@@ -325,21 +506,59 @@ def db_get_value(database_name, table_name, column, idn):
         msg = 'Invalid id number.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
-        cur.execute('SELECT {0} FROM {1} WHERE id = ?'.format(
-            column, table_name), (idn,))
-        value = cur.fetchone()
-        if value is not None:
-            value = value[0]
-        con.close()
-        return value
+    cur.execute('SELECT {0} FROM {1} WHERE id = ?'.format(
+        column, table_name), (idn,))
+    value = cur.fetchone()
+    if value is not None:
+        value = value[0]
+    return value
 
-    except Exception as e:
-        con.close()
-        raise e
+
+def db_get_value_in(database_name, table_name, column, idns):
+    """Get column values of several entry ids.
+
+    The values are read with IN queries of at most SQLITE_MAX_VARIABLES
+    parameters each.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+        column (str): column name.
+        idns (list): list of entry ids.
+
+    Returns:
+        a dict with entry ids and parameter values. Ids not found in the
+        table are not included.
+
+    """
+    con, column_names, _ = _get_table(database_name, table_name)
+
+    if column is None or len(column) == 0:
+        msg = 'Invalid column name.'
+        raise SqliteDatabaseError(msg)
+
+    if column not in column_names:
+        msg = 'Column "{0}" not found in database table.'.format(column)
+        raise SqliteDatabaseError(msg)
+
+    if idns is None or None in idns:
+        msg = 'Invalid id numbers.'
+        raise SqliteDatabaseError(msg)
+
+    idns = list(dict.fromkeys(idns))
+    cur = con.cursor()
+
+    values = {}
+    for start in range(0, len(idns), SQLITE_MAX_VARIABLES):
+        chunk = idns[start:start + SQLITE_MAX_VARIABLES]
+        cmd = 'SELECT id, "{0}" FROM {1} WHERE id IN ({2})'.format(
+            column, table_name, ','.join(['?']*len(chunk)))
+        cur.execute(cmd, chunk)
+        values.update(cur.fetchall())
+
+    return values
 
 
 def db_search_column(database_name, table_name, column, value):
@@ -355,9 +574,7 @@ def db_search_column(database_name, table_name, column, value):
         a list of dicts with database entries.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
+    con, column_names, _ = _get_table(database_name, table_name)
 
     if column is None or len(column) == 0:
         msg = 'Invalid column name.'
@@ -367,58 +584,101 @@ def db_search_column(database_name, table_name, column, value):
         msg = 'Invalid value to search.'
         raise SqliteDatabaseError(msg)
 
-    column_names = db_get_column_names(database_name, table_name)
     if column not in column_names:
         msg = 'Column "{0}" not found in database table.'.format(column)
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
-        cmd = 'SELECT * FROM {0} WHERE {1}="{2}"'.format(
-            table_name, column, str(value))
-        cur.execute(cmd)
-        entries = cur.fetchall()
-        con.close()
+    cmd = 'SELECT * FROM {0} WHERE "{1}" = ?'.format(table_name, column)
+    cur.execute(cmd, (str(value),))
+    entries = cur.fetchall()
 
-        list_of_dicts = []
-        for entry in entries:
-            _d = {}
-            for i, col in enumerate(column_names):
-                _d[col] = entry[i]
-            list_of_dicts.append(_d)
+    return [dict(zip(column_names, entry)) for entry in entries]
 
-        return list_of_dicts
 
-    except Exception as e:
-        con.close()
-        raise e
+def db_search_column_in(database_name, table_name, column, values):
+    """Search several values of a column in database table.
 
-
-def db_search_table(
-        database_name, table_name, columns=None, filters=None,
-        initial_idn=None, max_nr_lines=None):
-    """Search paremeter in database.
+    The values are searched with IN queries of at most SQLITE_MAX_VARIABLES
+    parameters each.
 
     Args:
         database_name (str): full file path to database.
         table_name (str): database table name.
-        columns (list, optional): list of column names to filter.
-        filters (list, optional): list of filters to apply.
-        initial_idn (int, optional): initial id to start filter.
-        max_nr_lines (int, optional): maximum number of lines.
+        column (str): column to search.
+        values (list): list of values to search.
 
     Returns:
-        a list of dicts with database entries.
+        a list of dicts with database entries, sorted by id.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
+    con, column_names, _ = _get_table(database_name, table_name)
+
+    if column is None or len(column) == 0:
+        msg = 'Invalid column name.'
+        raise SqliteDatabaseError(msg)
+
+    if values is None or any(value is None for value in values):
+        msg = 'Invalid values to search.'
+        raise SqliteDatabaseError(msg)
+
+    if column not in column_names:
+        msg = 'Column "{0}" not found in database table.'.format(column)
         raise SqliteDatabaseError(msg)
 
+    values = list(dict.fromkeys(str(value) for value in values))
+
+    cur = con.cursor()
+
+    entries = []
+    for start in range(0, len(values), SQLITE_MAX_VARIABLES):
+        chunk = values[start:start + SQLITE_MAX_VARIABLES]
+        cmd = 'SELECT * FROM {0} WHERE "{1}" IN ({2}) ORDER BY id'.format(
+            table_name, column, ','.join(['?']*len(chunk)))
+        cur.execute(cmd, chunk)
+        entries.extend(cur.fetchall())
+
+    if len(values) > SQLITE_MAX_VARIABLES:
+        id_idx = column_names.index('id')
+        entries.sort(key=lambda entry: entry[id_idx])
+
+    return [dict(zip(column_names, entry)) for entry in entries]
+
+
+def _to_number(value):
+    """Convert a filter string to int or float, or None if not a number."""
+    value = value.strip()
+    for number_type in (int, float):
+        try:
+            return number_type(value)
+        except ValueError:
+            pass
+    return None
+
+
+def _get_search_command(
+        table_name, table_columns, declared_types, columns, filters):
+    """Build the select command and filter conditions of a table search.
+
+    The filter values are returned as query parameters, so the command
+    text only depends on the columns and the kind of each filter.
+
+    Args:
+        table_name (str): database table name.
+        table_columns (tuple): column names of the table.
+        declared_types (tuple): declared column types of the table.
+        columns (list): list of column names to filter.
+        filters (list): list of filters to apply.
+
+    Returns:
+        the list of selected column names, the select command, the filter
+        conditions (empty string if there are no filters) and the list of
+        filter parameters.
+
+    """
     if columns is None or len(columns) == 0:
-        columns = db_get_column_names(database_name, table_name)
+        columns = table_columns
 
     if isinstance(columns, str):
         columns = [columns]
@@ -444,13 +704,10 @@ def db_search_table(
     column_names_str = column_names_str[:-2]
     cmd = 'SELECT {0:s} FROM {1:s}'.format(column_names_str, table_name)
 
-    column_types = db_get_column_types(
-        database_name, table_name)
-
-    if any(filt != '' for filt in filters_list):
-        cmd = cmd + ' WHERE '
+    column_types = _get_column_types(table_columns, declared_types)
 
-    and_flag = False
+    conditions = []
+    params = []
     for idx, column in enumerate(column_names):
         if column not in column_types.keys():
             msg = 'Column "{0}" not found in database table.'.format(column)
@@ -461,71 +718,186 @@ def db_search_table(
         filt = filters_list[idx]
 
         if filt != '':
-
-            if and_flag:
-                cmd = cmd + ' AND '
-            and_flag = True
-
             if data_type == str:
-                cmd = cmd + column + ' LIKE "%' + filt + '%"'
+                conditions.append(column + ' LIKE ?')
+                params.append('%' + filt + '%')
             else:
+                condition = None
+                values = []
                 if '~' in filt:
-                    fs = filt.split('~')
-                    if len(fs) == 2:
-                        cmd = cmd + column + ' >= ' + fs[0]
-                        cmd = cmd + ' AND '
-                        cmd = cmd + column + ' <= ' + fs[1]
+                    values = [_to_number(f) for f in filt.split('~')]
+                    if len(values) == 2 and None not in values:
+                        condition = column + ' >= ? AND ' + column + ' <= ?'
                 elif filt.lower() == 'none' or filt.lower() == 'null':
-                    cmd = cmd + column + ' IS NULL'
+                    condition = column + ' IS NULL'
                 else:
                     try:
-                        value = data_type(filt)
-                        cmd = cmd + column + ' = ' + str(value)
+                        values = [data_type(filt)]
+                        condition = column + ' = ?'
                     except ValueError:
-                        cmd = cmd + column + ' ' + filt
+                        match = _FILTER_OPERATOR.match(filt)
+                        if match is not None:
+                            values = [_to_number(match.group(2))]
+                            if None not in values:
+                                condition = (
+                                    column + ' ' + match.group(1) + ' ?')
+
+                if condition is None:
+                    msg = 'Invalid filter for column "{0}": {1}'
+                    msg = msg.format(column, filt)
+                    raise SqliteDatabaseError(msg)
+
+                conditions.append(condition)
+                params.extend(values)
+
+    return column_names, cmd, ' AND '.join(conditions), params
 
-    if max_nr_lines is not None:
-        limit_str = ' LIMIT {0:d}'.format(max_nr_lines)
-    else:
-        limit_str = ''
+
+def db_search_table(
+        database_name, table_name, columns=None, filters=None,
+        initial_idn=None, max_nr_lines=None):
+    """Search paremeter in database.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+        columns (list, optional): list of column names to filter.
+        filters (list, optional): list of filters to apply.
+        initial_idn (int, optional): initial id to start filter.
+        max_nr_lines (int, optional): maximum number of lines.
+
+    Returns:
+        a list of dicts with database entries.
+
+    """
+    con, table_columns, declared_types = _get_table(
+        database_name, table_name)
+
+    column_names, cmd, conditions, params = _get_search_command(
+        table_name, table_columns, declared_types, columns, filters)
+    if conditions != '':
+        cmd = cmd + ' WHERE ' + conditions
 
     if initial_idn is not None:
-        if 'WHERE' in cmd:
-            cmd = (
-                'SELECT * FROM (' + cmd +
-                ' AND id >= {0:d}{1:s})'.format(
-                    initial_idn, limit_str))
+        if conditions != '':
+            cmd = cmd + ' AND id >= ?'
         else:
-            cmd = (
-                'SELECT * FROM (' + cmd +
-                ' WHERE id >= {0:d}{1:s})'.format(
-                    initial_idn, limit_str))
+            cmd = cmd + ' WHERE id >= ?'
+        cmd = cmd + ' ORDER BY id'
+        params = params + [initial_idn]
+    else:
+        cmd = cmd + ' ORDER BY id DESC'
 
+    if max_nr_lines is not None:
+        cmd = cmd + ' LIMIT ?'
+        params = params + [max_nr_lines]
+
+    cur = con.cursor()
+
+    cur.execute(cmd, params)
+    data = cur.fetchall()
+    if initial_idn is None:
+        data.reverse()
+
+    return [dict(zip(column_names, entry)) for entry in data]
+
+
+def db_iter_table(
+        database_name, table_name, columns=None, filters=None,
+        initial_idn=None, page_size=None):
+    """Iterate over the filtered table entries, in ascending id order.
+
+    The entries are read in pages, paginating on the id column. If
+    page_size is not given, the pages start with ITER_MIN_PAGE_SIZE entries
+    and double up to ITER_MAX_PAGE_SIZE entries, so the first entries are
+    returned quickly.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+        columns (list, optional): list of column names to filter.
+        filters (list, optional): list of filters to apply.
+        initial_idn (int, optional): initial id to start filter.
+        page_size (int, optional): number of entries read per query.
+
+    Yields:
+        dicts with database entries.
+
+    """
+    con, table_columns, declared_types = _get_table(
+        database_name, table_name)
+
+    column_names, cmd, conditions, params = _get_search_command(
+        table_name, table_columns, declared_types, columns, filters)
+    if conditions != '':
+        cmd = cmd + ' WHERE (' + conditions + ') AND id > ?'
+    else:
+        cmd = cmd + ' WHERE id > ?'
+    cmd = cmd + ' ORDER BY id LIMIT ?'
+
+    if page_size is None:
+        size = ITER_MIN_PAGE_SIZE
+    else:
+        size = page_size
+
+    if initial_idn is not None:
+        last_idn = initial_idn - 1
     else:
-        cmd = (
-            'SELECT * FROM (' + cmd +
-            ' ORDER BY id DESC{0:s}) ORDER BY id ASC'.format(
-                limit_str))
+        last_idn = -2**63
+
+    id_idx = column_names.index('id')
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
-        cur.execute(cmd)
+    while True:
+        cur.execute(cmd, params + [last_idn, size])
         data = cur.fetchall()
-        con.close()
 
-        list_of_dicts = []
         for entry in data:
-            _d = {}
-            for i, col in enumerate(column_names):
-                _d[col] = entry[i]
-            list_of_dicts.append(_d)
-        return list_of_dicts
+            yield dict(zip(column_names, entry))
 
-    except Exception as e:
-        con.close()
-        raise e
+        if len(data) < size:
+            break
+
+        last_idn = data[-1][id_idx]
+        if page_size is None:
+            size = min(2*size, ITER_MAX_PAGE_SIZE)
+
+
+def db_get_columns(database_name, table_name, columns=None, filters=None):
+    """Get the filtered table entries as one array per column.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+        columns (list, optional): list of column names to filter.
+        filters (list, optional): list of filters to apply.
+
+    Returns:
+        a dict with column names and numpy arrays of values, in ascending
+        id order. The id column is always included.
+
+    """
+    con, table_columns, declared_types = _get_table(
+        database_name, table_name)
+
+    column_names, cmd, conditions, params = _get_search_command(
+        table_name, table_columns, declared_types, columns, filters)
+    if conditions != '':
+        cmd = cmd + ' WHERE ' + conditions
+    cmd = cmd + ' ORDER BY id'
+
+    cur = con.cursor()
+
+    cur.execute(cmd, params)
+    data = cur.fetchall()
+
+    if len(data) == 0:
+        return {col: _np.array([]) for col in column_names}
+
+    return {
+        col: _np.array(values)
+        for col, values in zip(column_names, zip(*data))}
 
 
 def db_create_table(database_name, table_name, db_dict):
@@ -588,7 +960,11 @@ def db_create_table(database_name, table_name, db_dict):
         else:
             unique = _utils.DEFAULT_UNIQUE
 
-        if dtype == int:
+        storage = db_dict[attr_name].get('storage', _utils.DEFAULT_STORAGE)
+
+        if dtype == _np.ndarray and storage == 'binary':
+            db_type = 'BLOB'
+        elif dtype == int:
             db_type = 'INTEGER'
         elif dtype == float:
             db_type = 'REAL'
@@ -607,21 +983,17 @@ def db_create_table(database_name, table_name, db_dict):
 
         variables.append((column, db_type))
 
-    con = _sqlite.connect(database_name)
+    con = _get_connection(database_name)
     cur = con.cursor()
 
-    try:
-        cmd = 'CREATE TABLE IF NOT EXISTS {0} ('.format(table_name)
-        for var in variables:
-            cmd = cmd + "\'{0}\' {1},".format(var[0], var[1])
-        cmd = cmd + "PRIMARY KEY(\'id\'));"
-        cur.execute(cmd)
-        con.close()
-        return True
-
-    except Exception as e:
-        con.close()
-        raise e
+    cmd = 'CREATE TABLE IF NOT EXISTS {0} ('.format(table_name)
+    for var in variables:
+        cmd = cmd + "\'{0}\' {1},".format(var[0], var[1])
+    cmd = cmd + "PRIMARY KEY(\'id\'));"
+    cur.execute(cmd)
+    _release_connection(database_name)
+    refresh_schema(database_name, table_name)
+    return True
 
 
 def db_save(database_name, table_name, values_dict):
@@ -636,14 +1008,7 @@ def db_save(database_name, table_name, values_dict):
         The id of the saved database record.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
-
-    column_names = db_get_column_names(database_name, table_name)
-    if len(column_names) == 0:
-        msg = 'Empty database table'
-        raise SqliteDatabaseError(msg)
+    con, column_names, _ = _get_table(database_name, table_name)
 
     if values_dict is None or len(values_dict) == 0:
         msg = 'Invalid values to save in database.'
@@ -653,74 +1018,143 @@ def db_save(database_name, table_name, values_dict):
         msg = 'Inconsistent number of values for table {0}.'.format(table_name)
         raise SqliteDatabaseError(msg)
 
-    values = []
-    for column in column_names:
-        values.append(values_dict[column])
-    aux_str = '(' + ','.join(['?']*len(values)) + ')'
+    values = [values_dict[column] for column in column_names]
+    cmd = _get_insert_command(table_name, len(column_names))
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
-        cur.execute(
-            ('INSERT INTO {0} VALUES '.format(table_name) + aux_str), values)
+    with con:
+        cur.execute(cmd, values)
 
         idn = cur.lastrowid
-        con.commit()
-        con.close()
-        return idn
 
-    except Exception as e:
-        con.close()
-        raise e
+    _release_connection(database_name)
+    return idn
 
 
-def db_read(database_name, table_name, idn=None):
-    """Read a table entry from database.
+def db_save_many(database_name, table_name, values_dicts):
+    """Insert several entries into database table in a single transaction.
 
     Args:
         database_name (str): full file path to database.
         table_name (str): database table name.
-        idn (int, optional): entry id (returns last id if not specified).
+        values_dicts (list): list of dicts with values to save in database.
 
     Returns:
-        a dict with values read from database.
+        a list with the ids of the saved database records.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
+    con, column_names, _ = _get_table(database_name, table_name)
 
-    column_names = db_get_column_names(database_name, table_name)
-    if len(column_names) == 0:
-        msg = 'Empty database table'
+    if values_dicts is None or len(values_dicts) == 0:
+        msg = 'Invalid values to save in database.'
         raise SqliteDatabaseError(msg)
 
-    con = _sqlite.connect(database_name)
+    for values_dict in values_dicts:
+        if len(values_dict) != len(column_names):
+            msg = 'Inconsistent number of values for table {0}.'.format(
+                table_name)
+            raise SqliteDatabaseError(msg)
+
+    cmd = _get_insert_command(table_name, len(column_names))
+
     cur = con.cursor()
 
+    with con:
+        # The write lock is taken before reading the last id, so another
+        # connection cannot insert the same ids before this transaction.
+        if not con.in_transaction:
+            cur.execute('BEGIN IMMEDIATE')
+        cur.execute('SELECT MAX(id) FROM {0}'.format(table_name))
+        last_id = cur.fetchone()[0]
+        if last_id is None:
+            last_id = 0
+
+        idns = list(range(last_id + 1, last_id + 1 + len(values_dicts)))
+        id_idx = column_names.index('id')
+        rows = []
+        for idn, values_dict in zip(idns, values_dicts):
+            row = [values_dict[column] for column in column_names]
+            row[id_idx] = idn
+            rows.append(row)
+
+        cur.executemany(cmd, rows)
+
+    _release_connection(database_name)
+    return idns
+
+
+@_contextlib.contextmanager
+def db_bulk_load(database_name, table_name):
+    """Context manager to load many entries into a database table.
+
+    The indexes created for the table are dropped and foreign key checks
+    are disabled inside the context. On exit, even if the load fails, the
+    indexes are created again, in a single pass over the table, and the
+    table statistics are updated.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+
+    Yields:
+        the sqlite3 connection.
+
+    """
+    con, _, _ = _get_table(database_name, table_name)
+    cur = con.cursor()
+
+    cur.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' "
+        "AND tbl_name = ? AND sql IS NOT NULL", (table_name,))
+    indexes = cur.fetchall()
+
+    cur.execute('PRAGMA foreign_keys')
+    foreign_keys = cur.fetchone()[0]
+    cur.execute('PRAGMA foreign_keys=OFF')
+
     try:
-        if idn is not None:
-            cur.execute(
-                'SELECT * FROM {0} WHERE id = ?'.format(table_name), (idn,))
-        else:
-            cur.execute(
-                """SELECT * FROM {0}\
-                WHERE id = (SELECT MAX(id) FROM {0})""".format(table_name))
-        entry = cur.fetchone()
-        con.close()
-        if entry is None:
-            return {}
+        for name, _ in indexes:
+            cur.execute('DROP INDEX IF EXISTS "{0}"'.format(name))
+        _release_connection(database_name)
+        yield con
 
-    except Exception as e:
-        con.close()
-        raise e
+    finally:
+        cur = _get_connection(database_name).cursor()
+        for _, sql in indexes:
+            cur.execute(sql)
+        if len(indexes) > 0:
+            cur.execute('ANALYZE {0}'.format(table_name))
+        cur.execute('PRAGMA foreign_keys={0:d}'.format(foreign_keys))
+        _release_connection(database_name)
 
-    values_dict = {}
-    for idx, column in enumerate(column_names):
-        values_dict[column] = entry[idx]
 
-    return values_dict
+def db_read(database_name, table_name, idn=None):
+    """Read a table entry from database.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+        idn (int, optional): entry id (returns last id if not specified).
+
+    Returns:
+        a dict with values read from database.
+
+    """
+    con, column_names, _ = _get_table(database_name, table_name)
+    cur = con.cursor()
+
+    if idn is not None:
+        cur.execute(
+            'SELECT * FROM {0} WHERE id = ?'.format(table_name), (idn,))
+    else:
+        cur.execute(
+            'SELECT * FROM {0} ORDER BY id DESC LIMIT 1'.format(table_name))
+    entry = cur.fetchone()
+    if entry is None:
+        return {}
+
+    return dict(zip(column_names, entry))
 
 
 def db_update(database_name, table_name, values_dict, idn):
@@ -736,14 +1170,7 @@ def db_update(database_name, table_name, values_dict, idn):
         True if update was successful, False otherwise.
 
     """
-    if not db_table_exists(database_name, table_name):
-        msg = 'Database table not found.'
-        raise SqliteDatabaseError(msg)
-
-    column_names = db_get_column_names(database_name, table_name)
-    if len(column_names) == 0:
-        msg = 'Empty database table {0}.'.format(table_name)
-        raise SqliteDatabaseError(msg)
+    con, column_names, _ = _get_table(database_name, table_name)
 
     if values_dict is None or len(values_dict) == 0:
         msg = 'Invalid values to save in database.'
@@ -757,27 +1184,65 @@ def db_update(database_name, table_name, values_dict, idn):
         msg = 'Invalid id number.'
         raise SqliteDatabaseError(msg)
 
-    values = []
-    aux_str = ''
-    for column in column_names:
-        values.append(values_dict[column])
-        aux_str = aux_str + '`' + column + '`' + '=?, '
-    aux_str = aux_str[:-2]
+    values = [values_dict[column] for column in column_names]
+    values.append(idn)
+    cmd = _get_update_command(table_name, tuple(column_names))
 
-    con = _sqlite.connect(database_name)
     cur = con.cursor()
 
-    try:
-        if idn is not None:
-            cur.execute("""UPDATE {0} SET {1} WHERE
-                        id = {2}""".format(table_name, aux_str, idn), values)
-            con.commit()
-            con.close()
-            return True
-        else:
-            message = 'Invalid entry id.'
-            raise SqliteDatabaseError(message)
+    with con:
+        cur.execute(cmd, values)
 
-    except Exception as e:
-        con.close()
-        raise e
+    _release_connection(database_name)
+    return True
+
+
+def db_update_many(database_name, table_name, values_dicts, idns):
+    """Update several table entries in a single transaction.
+
+    The entries are updated only if all ids are found in the table,
+    otherwise the transaction is rolled back and no entry is changed.
+
+    Args:
+        database_name (str): full file path to database.
+        table_name (str): database table name.
+        values_dicts (list): list of dicts with values to save in database.
+        idns (list): list of entry ids.
+
+    Returns:
+        True if all entries were updated, False if an id was not found.
+
+    """
+    con, column_names, _ = _get_table(database_name, table_name)
+
+    if values_dicts is None or len(values_dicts) == 0:
+        msg = 'Invalid values to save in database.'
+        raise SqliteDatabaseError(msg)
+
+    if idns is None or len(idns) != len(values_dicts) or None in idns:
+        msg = 'Invalid id numbers.'
+        raise SqliteDatabaseError(msg)
+
+    for values_dict in values_dicts:
+        if len(values_dict) != len(column_names):
+            msg = 'Inconsistent number of values for table {0}.'.format(
+                table_name)
+            raise SqliteDatabaseError(msg)
+
+    cmd = _get_update_command(table_name, tuple(column_names))
+    rows = []
+    for idn, values_dict in zip(idns, values_dicts):
+        row = [values_dict[column] for column in column_names]
+        row.append(idn)
+        rows.append(row)
+
+    cur = con.cursor()
+
+    with con:
+        cur.executemany(cmd, rows)
+        updated = cur.rowcount == len(rows)
+        if not updated:
+            con.rollback()
+
+    _release_connection(database_name)
+    return updated
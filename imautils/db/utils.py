@@ -2,15 +2,31 @@
 
 """Utils."""
 
+import io as _io
+import json as _json
+import math as _math
 import time as _time
+import functools as _functools
 import numpy as _np
 
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
 
 EMPTY_STR = '--'
 COMMENT_CHAR = "#"
 DEFAULT_DTYPE = str
 DEFAULT_NOT_NULL = False
 DEFAULT_UNIQUE = False
+DEFAULT_STORAGE = 'json'
+
+if _orjson is not None:
+    _orjson_dumps = _functools.partial(
+        _orjson.dumps, option=_orjson.OPT_SERIALIZE_NUMPY)
+else:
+    _orjson_dumps = None
 
 
 def read_file(filename):
@@ -35,7 +51,8 @@ def find_value(data, variable, vtype=str, raise_error=True):
     """Find variable value in file data.
 
     Args:
-        data (list): list of file lines.
+        data (list or dict): list of file lines, or the dict of values
+            returned by find_values (avoids scanning the lines again).
         variable (str): string to search in file lines.
         vtype (type): variable type
         raise_error (bool): raise error flag.
@@ -47,15 +64,21 @@ def find_value(data, variable, vtype=str, raise_error=True):
         ValueError: if raise_error is True and the value was not found.
 
     """
-    file_line = None
-    for line in data:
-        if line.split('\t')[0].strip() == variable:
-            file_line = line
-            break
+    if isinstance(data, dict):
+        value_str = data.get(variable)
+    else:
+        value_str = None
+        for line in data:
+            if line.split('\t')[0].strip() == variable:
+                line_split = line.split()
+                if len(line_split) > 1:
+                    value_str = line_split[1]
+                break
 
     try:
-        value = file_line.split()[1]
-        value = vtype(value)
+        if value_str is None:
+            raise ValueError
+        value = vtype(value_str)
     except Exception:
         if raise_error:
             message = 'Invalid value for "%s"' % variable
@@ -66,6 +89,28 @@ def find_value(data, variable, vtype=str, raise_error=True):
     return value
 
 
+def find_values(data):
+    """Find all variable values in file data.
+
+    Args:
+        data (list): list of file lines.
+
+    Returns:
+        a dict with the first value string found for each variable.
+
+    """
+    values = {}
+    for line in data:
+        variable = line.split('\t')[0].strip()
+        if variable not in values:
+            line_split = line.split()
+            if len(line_split) > 1:
+                values[variable] = line_split[1]
+            else:
+                values[variable] = None
+    return values
+
+
 def find_index(data, variable):
     """Find index of line with the specified variable.
 
@@ -92,6 +137,75 @@ def find_index(data, variable):
     return index
 
 
+def _is_finite(value):
+    """Return False if value contains NaN or infinite floats."""
+    if isinstance(value, float):
+        return _math.isfinite(value)
+    if isinstance(value, _np.ndarray):
+        return value.dtype.kind not in 'fc' or bool(_np.isfinite(value).all())
+    if isinstance(value, _np.floating):
+        return bool(_np.isfinite(value))
+    if isinstance(value, (list, tuple)):
+        return all(_is_finite(v) for v in value)
+    if isinstance(value, dict):
+        return all(_is_finite(v) for v in value.values())
+    return True
+
+
+def json_dumps(value):
+    """Serialize value to a compact JSON string (no whitespace).
+
+    Uses orjson, if available, which serializes numpy arrays directly.
+    orjson writes non-finite floats as null, so if its output contains
+    null the value is checked, and values with non-finite floats are
+    serialized with the standard json module.
+
+    Args:
+        value (object): value to serialize.
+
+    Returns:
+        the JSON string.
+
+    """
+    if _orjson is not None:
+        try:
+            data = _orjson_dumps(value)
+        except TypeError:
+            data = None
+
+        if data is not None and (b'null' not in data or _is_finite(value)):
+            return data.decode()
+
+    return _json.dumps(value, separators=(',', ':'), default=_to_builtin)
+
+
+def _to_builtin(value):
+    """Convert numpy values nested in a value serialized by json."""
+    if isinstance(value, (_np.ndarray, _np.generic)):
+        return value.tolist()
+    msg = 'Object of type {0} is not JSON serializable'.format(
+        type(value).__name__)
+    raise TypeError(msg)
+
+
+def json_loads(value):
+    """Deserialize a JSON string.
+
+    Args:
+        value (str or bytes): JSON string.
+
+    Returns:
+        the deserialized value.
+
+    """
+    if _orjson is not None:
+        try:
+            return _orjson.loads(value)
+        except ValueError:
+            pass
+    return _json.loads(value)
+
+
 def get_timestamp():
     """Get timestamp (format: Year-month-day_hour-min-sec)."""
     timestamp = _time.strftime('%Y-%m-%d_%H-%M-%S', _time.localtime())
@@ -131,6 +245,34 @@ def to_array(value):
     return value
 
 
+def array_to_bytes(value):
+    """Serialize a numpy array to bytes in the .npy format.
+
+    Args:
+        value (ndarray): numpy array.
+
+    Returns:
+        the array bytes, with dtype and shape header.
+
+    """
+    buf = _io.BytesIO()
+    _np.save(buf, value, allow_pickle=False)
+    return buf.getvalue()
+
+
+def bytes_to_array(value):
+    """Deserialize a numpy array saved by array_to_bytes.
+
+    Args:
+        value (bytes): array bytes in the .npy format.
+
+    Returns:
+        the numpy array.
+
+    """
+    return _np.load(_io.BytesIO(value), allow_pickle=False)
+
+
 def to_float(value, precision=None):
     """Return a float number or None."""
     if value is None:
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""Background writer that saves database documents in batches."""
+
+import time as _time
+import queue as _queue
+import atexit as _atexit
+import threading as _threading
+import concurrent.futures as _futures
+
+from . import sqlitedatabase as _sqlitedatabase
+from . import mongodatabase as _mongodatabase
+
+
+class DatabaseWriter():
+    """Save queued documents from a background thread.
+
+    Documents queued within max_wait seconds of each other are saved with
+    a single db_save_many call per collection, up to max_batch documents.
+    """
+
+    def __init__(self, max_batch=256, max_wait=0.005):
+        """Initialize object.
+
+        Args:
+            max_batch (int): maximum number of documents per batch.
+            max_wait (float): time to wait for more documents [s].
+
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = _queue.Queue()
+        self._lock = _threading.Lock()
+        self._thread = None
+
+    def submit(self, target, values_dict, callback=None):
+        """Queue a document to be saved.
+
+        Args:
+            target (tuple): (mongo, server, database_name, collection_name).
+            values_dict (dict): dict with values to save in database.
+            callback (function, optional): called with the saved id, from
+                the writer thread, before the future is resolved.
+
+        Returns:
+            a concurrent.futures.Future with the id of the saved document.
+
+        """
+        future = _futures.Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = _threading.Thread(
+                    target=self._run, name='DatabaseWriter', daemon=True)
+                self._thread.start()
+            self._queue.put((target, values_dict, callback, future))
+        return future
+
+    def flush(self):
+        """Wait until all queued documents are saved."""
+        self._queue.join()
+
+    def close(self):
+        """Save the queued documents and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            if thread is not None:
+                self._queue.put(None)
+
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            items = [item]
+            deadline = _time.monotonic() + self.max_wait
+            while len(items) < self.max_batch:
+                timeout = deadline - _time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except _queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                items.append(item)
+
+            try:
+                self._save(items)
+            except Exception as e:
+                # A failure must not stop the thread, otherwise flush
+                # would wait forever for the remaining documents.
+                for _, _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _save(self, items):
+        groups = {}
+        for item in items:
+            # Cancelled futures are dropped, the others can no longer be
+            # cancelled once they are marked as running.
+            if item[3].set_running_or_notify_cancel():
+                groups.setdefault(item[0], []).append(item)
+
+        for target, group in groups.items():
+            mongo, server, database_name, collection_name = target
+            values_dicts = [values_dict for _, values_dict, _, _ in group]
+            try:
+                if mongo:
+                    idns = _mongodatabase.db_save_many(
+                        _mongodatabase.db_connect(server=server),
+                        database_name, collection_name, values_dicts)
+                else:
+                    idns = _sqlitedatabase.db_save_many(
+                        database_name, collection_name, values_dicts)
+            except Exception as e:
+                for _, _, _, future in group:
+                    future.set_exception(e)
+                continue
+
+            for (_, _, callback, future), idn in zip(group, idns):
+                try:
+                    if callback is not None:
+                        callback(idn)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(idn)
+
+
+_writer = None
+_writer_lock = _threading.Lock()
+
+
+def get_writer():
+    """Return the DatabaseWriter shared by all documents."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DatabaseWriter()
+        return _writer
+
+
+def close_writer():
+    """Save the queued documents and stop the shared writer."""
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.close()
+
+
+_atexit.register(close_writer)
@@ -1,12 +1,15 @@
 
 import os
 import json
+import asyncio
 import unittest
 import pymongo
+import sqlite3
 import numpy as np
 import collections
 
 from imautils.db import database as dbm
+from imautils.db import mongodatabase_async as dbm_async
 
 
 _TEST_PATH = os.path.dirname(__file__)
@@ -235,6 +238,16 @@ class TestDatabaseDocument(unittest.TestCase):
         except Exception:
             pass
 
+    def test_str_attribute_order(self):
+        class Document(dbm.DatabaseDocument):
+            collection_name = self.collection_name
+            db_dict = self.db_dict
+
+        doc = Document(database_name=self.sqlite_database_name)
+        lines = str(doc).splitlines()
+        attrs = [line.split(':')[0].strip() for line in lines]
+        self.assertEqual(attrs[:len(self.db_dict)], list(self.db_dict))
+
     def test_db_database_exists(self):
         self.assertTrue(self.mongo_db.db_database_exists())
         self.assertTrue(self.sqlite_db.db_database_exists())
@@ -259,6 +272,23 @@ class TestDatabaseDocument(unittest.TestCase):
         field_names = self.sqlite_db.db_get_field_names()
         self.assertEqual(len(field_names), 8)
 
+    def test_db_get_field_names_cache(self):
+        self.assertEqual(len(self.mongo_db.db_get_field_names()), 0)
+        for idx, attr in enumerate(self.db_dict.keys()):
+            setattr(self.mongo_db, attr, self.values_1[idx])
+        self.mongo_db.db_save()
+        self.assertEqual(self.mongo_db.db_get_field_names(), self.field_names)
+
+        self.assertEqual(self.sqlite_db.db_get_field_names(), self.field_names)
+        con = sqlite3.connect(self.sqlite_database_name)
+        with con:
+            con.execute('ALTER TABLE {0} ADD COLUMN new_attr TEXT'.format(
+                self.collection_name))
+        con.close()
+        self.assertEqual(
+            self.sqlite_db.db_get_field_names(),
+            self.field_names + ['new_attr'])
+
     def test_db_get_field_types(self):
         field_types = self.mongo_db.db_get_field_types()
         self.assertEqual(len(field_types), 0)
@@ -266,6 +296,68 @@ class TestDatabaseDocument(unittest.TestCase):
         field_types = self.sqlite_db.db_get_field_types()
         self.assertEqual(len(field_types), 8)
 
+    def test_db_read_ndarray(self):
+        for idx, attr in enumerate(self.db_dict.keys()):
+            setattr(self.mongo_db, attr, self.values_1[idx])
+        self.mongo_db.array_attr = np.array([[1.5, 2.5], [3.5, 4.5]])
+        self.mongo_db.db_save()
+
+        collection = self.mongo_db.client[self.mongo_database_name][
+            self.collection_name]
+        doc = collection.find_one({'id': 1})
+        self.assertTrue(doc['array_attr']['__ndarray__'])
+        self.assertEqual(
+            self.mongo_db.db_get_field_types()['array_attr'], np.ndarray)
+
+        # Documents saved before the binary format store lists.
+        doc = dict(zip(self.field_names, self.values_2))
+        doc['tuple_attr'] = list(doc['tuple_attr'])
+        doc['array_attr'] = doc['array_attr'].tolist()
+        collection.insert_one(doc)
+
+        temp_db_doc = dbm.DatabaseDocument(
+            database_name=self.mongo_database_name,
+            mongo=True,
+            server=self.mongo_server)
+        temp_db_doc.label = self.label
+        temp_db_doc.collection_name = self.collection_name
+        temp_db_doc.db_dict = self.db_dict
+
+        self.assertTrue(temp_db_doc.db_read(idn=1))
+        self.assertIsInstance(temp_db_doc.array_attr, np.ndarray)
+        np.testing.assert_equal(
+            temp_db_doc.array_attr, np.array([[1.5, 2.5], [3.5, 4.5]]))
+
+        self.assertTrue(temp_db_doc.db_read(idn=2))
+        self.assertIsInstance(temp_db_doc.array_attr, np.ndarray)
+        np.testing.assert_equal(temp_db_doc.array_attr, self.values_2[-1])
+
+    def test_db_collection_read_ndarray(self):
+        for idx, attr in enumerate(self.db_dict.keys()):
+            setattr(self.mongo_db, attr, self.values_1[idx])
+        self.mongo_db.array_attr = np.array([[1.5, 2.5], [3.5, 4.5]])
+        idn = self.mongo_db.db_save()
+
+        collection = dbm.DatabaseCollection(
+            database_name=self.mongo_database_name,
+            collection_name=self.collection_name,
+            mongo=True,
+            server=self.mongo_server)
+        expected = np.array([[1.5, 2.5], [3.5, 4.5]])
+
+        values = [
+            collection.db_get_values('array_attr')[0],
+            collection.db_get_value('array_attr', idn),
+            collection.db_get_value_in('array_attr', [idn])[idn],
+            collection.db_search_field('id', idn)[0]['array_attr'],
+            collection.db_search_field_in('id', [idn])[0]['array_attr'],
+            collection.db_search_collection()[0]['array_attr'],
+            next(iter(collection.db_iter_collection()))['array_attr'],
+            ]
+        for value in values:
+            self.assertIsInstance(value, np.ndarray)
+            np.testing.assert_equal(value, expected)
+
     def test_db_get_first_id(self):
         idn = self.mongo_db.db_get_first_id()
         self.assertIsNone(idn)
@@ -482,6 +574,99 @@ class TestDatabaseDocument(unittest.TestCase):
         np.testing.assert_equal(
             temp_db_doc.array_attr, db_doc.array_attr)
 
+    def test_db_save_many_update_many(self):
+        for mongo in (True, False):
+            if mongo:
+                kwargs = {
+                    'database_name': self.mongo_database_name,
+                    'mongo': True,
+                    'server': self.mongo_server}
+            else:
+                kwargs = {
+                    'database_name': self.sqlite_database_name,
+                    'mongo': False}
+
+            docs = []
+            for values in (self.values_1, self.values_2):
+                db_doc = dbm.DatabaseDocument(**kwargs)
+                db_doc.label = self.label
+                db_doc.collection_name = self.collection_name
+                db_doc.db_dict = self.db_dict
+                for idx, attr in enumerate(self.db_dict.keys()):
+                    setattr(db_doc, attr, values[idx])
+                docs.append(db_doc)
+
+            idns = dbm.DatabaseDocument.db_save_many(docs, batch_size=1)
+            self.assertEqual(idns, [1, 2])
+            self.assertEqual([doc.idn for doc in docs], [1, 2])
+
+            docs[0].str_attr = 'other_string'
+            docs[1].str_attr = 'other_new_string'
+            self.assertTrue(
+                dbm.DatabaseDocument.db_update_many(docs, idns))
+
+            temp_db_doc = dbm.DatabaseDocument(**kwargs)
+            temp_db_doc.label = self.label
+            temp_db_doc.collection_name = self.collection_name
+            temp_db_doc.db_dict = self.db_dict
+            for idn, db_doc in zip(idns, docs):
+                self.assertTrue(temp_db_doc.db_read(idn=idn))
+                self.assertEqual(temp_db_doc.str_attr, db_doc.str_attr)
+                np.testing.assert_equal(
+                    temp_db_doc.array_attr, db_doc.array_attr)
+
+            # No document is updated if an id is not found, even if the
+            # documents of the missing id are in a later batch.
+            docs[0].str_attr = 'not_saved'
+            self.assertFalse(dbm.DatabaseDocument.db_update_many(
+                docs, [1, 10], batch_size=1))
+            self.assertTrue(temp_db_doc.db_read(idn=1))
+            self.assertEqual(temp_db_doc.str_attr, 'other_string')
+
+    def test_async_database_document(self):
+        async def run(kwargs):
+            db_doc = dbm.AsyncDatabaseDocument(**kwargs)
+            db_doc.label = self.label
+            db_doc.collection_name = self.collection_name
+            db_doc.db_dict = self.db_dict
+            for idx, attr in enumerate(self.db_dict.keys()):
+                setattr(db_doc, attr, self.values_1[idx])
+
+            try:
+                idns = [await db_doc.db_save(), await db_doc.db_save()]
+                self.assertEqual(idns, [1, 2])
+
+                db_doc.str_attr = 'new_string'
+                self.assertTrue(await db_doc.db_update(2))
+
+                temp_db_doc = dbm.AsyncDatabaseDocument(**kwargs)
+                temp_db_doc.label = self.label
+                temp_db_doc.collection_name = self.collection_name
+                temp_db_doc.db_dict = self.db_dict
+                self.assertTrue(await temp_db_doc.db_read(idn=2))
+                self.assertEqual(temp_db_doc.str_attr, 'new_string')
+                np.testing.assert_equal(
+                    temp_db_doc.array_attr, self.values_1[-1])
+
+                entries = await temp_db_doc.db_search_collection(
+                    fields=['id', 'str_attr'], filters=['', 'new'])
+                self.assertEqual(
+                    entries, [{'id': 2, 'str_attr': 'new_string'}])
+
+                entries = await temp_db_doc.db_search_collection(
+                    fields=['id'], max_nr_lines=1)
+                self.assertEqual(entries, [{'id': 2}])
+            finally:
+                await dbm_async.close_clients()
+
+        asyncio.run(run({
+            'database_name': self.mongo_database_name,
+            'mongo': True,
+            'server': self.mongo_server}))
+        asyncio.run(run({
+            'database_name': self.sqlite_database_name,
+            'mongo': False}))
+
 
 if __name__ == '__main__':
     unittest.main()
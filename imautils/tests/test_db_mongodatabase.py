@@ -372,6 +372,39 @@ class TestMongoDatabaseNonEmptycollection(unittest.TestCase):
                 self.client, self.database_name,
                 self.collection_name, 'other_name')
 
+    def test_ndarray_to_bson(self):
+        for value in (
+                np.array([[1.5, 2.5], [3.5, 4.5]]),
+                np.array([1, 2, 3], dtype=np.int32),
+                np.array([], dtype=np.float32)):
+            values_dict = dict(self.values_dict_2)
+            values_dict['array_attr'] = dbm.ndarray_to_bson(value)
+            idn = dbm.db_save(
+                self.client, self.database_name,
+                self.collection_name, values_dict)
+
+            doc = self.client[self.database_name][
+                self.collection_name].find_one({'id': idn})
+            self.assertTrue(dbm.is_bson_ndarray(doc['array_attr']))
+            rvalue = dbm.bson_to_ndarray(doc['array_attr'])
+            self.assertEqual(rvalue.dtype, value.dtype)
+            np.testing.assert_equal(rvalue, value)
+
+            rvalues_dict = dbm.db_read(
+                self.client, self.database_name, self.collection_name, idn)
+            rvalue = rvalues_dict['array_attr']
+            self.assertIsInstance(rvalue, np.ndarray)
+            self.assertEqual(rvalue.dtype, value.dtype)
+            np.testing.assert_equal(rvalue, value)
+
+            field_types = dbm.db_get_field_types(
+                self.client, self.database_name, self.collection_name)
+            self.assertEqual(field_types['array_attr'], np.ndarray)
+
+        self.assertFalse(dbm.is_bson_ndarray({'a': 1, 'b': 2}))
+        self.assertEqual(
+            dbm.ndarray_to_bson(np.array([1, 'a'], dtype=object)), [1, 'a'])
+
     def test_db_get_value(self):
         rvalue = dbm.db_get_value(
             self.client, self.database_name,
@@ -492,6 +525,99 @@ class TestMongoDatabaseNonEmptycollection(unittest.TestCase):
             initial_idn=1, max_nr_lines=1)
         self.assertEqual(len(entries), 1)
 
+    def test_db_iter_collection(self):
+        entries = list(dbm.db_iter_collection(
+            self.client, self.database_name, self.collection_name,
+            page_size=1))
+        np.testing.assert_equal(
+            entries, [self.values_dict_1, self.values_dict_2])
+
+        entries = list(dbm.db_iter_collection(
+            self.client, self.database_name, self.collection_name,
+            initial_idn=2))
+        np.testing.assert_equal(entries, [self.values_dict_2])
+
+        entries = list(dbm.db_iter_collection(
+            self.client, self.database_name, self.collection_name,
+            ['id', 'str_attr'], ['', self.values_dict_1['str_attr']]))
+        self.assertEqual(
+            entries, dbm.db_search_collection(
+                self.client, self.database_name, self.collection_name,
+                ['id', 'str_attr'], ['', self.values_dict_1['str_attr']]))
+        self.assertNotIn('_id', entries[0])
+
+    def test_db_get_columns(self):
+        columns = dbm.db_get_columns(
+            self.client, self.database_name, self.collection_name,
+            ['date', 'str_attr'])
+        self.assertEqual(list(columns.keys()), ['id', 'date', 'str_attr'])
+        np.testing.assert_equal(columns['id'], [1, 2])
+        np.testing.assert_equal(
+            columns['str_attr'],
+            [self.values_dict_1['str_attr'], self.values_dict_2['str_attr']])
+
+        columns = dbm.db_get_columns(
+            self.client, self.database_name, self.collection_name,
+            'str_attr', [self.values_dict_2['str_attr']])
+        np.testing.assert_equal(columns['id'], [2])
+
+    def test_db_get_columns_arrays(self):
+        values_dicts = []
+        for i in range(3):
+            values_dict = dict(zip(self.field_names, self.values_1))
+            values_dict['list_attr'] = list(range(i + 1))
+            values_dict['tuple_attr'] = list(range(i + 2))
+            values_dict['array_attr'] = dbm.ndarray_to_bson(
+                np.arange(i + 1, dtype=np.float64))
+            values_dicts.append(values_dict)
+        dbm.db_delete(
+            self.client, self.database_name, self.collection_name, [1, 2])
+        dbm.db_save_many(
+            self.client, self.database_name, self.collection_name,
+            values_dicts)
+
+        columns = dbm.db_get_columns(
+            self.client, self.database_name, self.collection_name)
+        self.assertEqual(len(columns['id']), len(values_dicts))
+        for field in ('dict_attr', 'list_attr', 'tuple_attr', 'array_attr'):
+            self.assertEqual(columns[field].dtype, object)
+            self.assertEqual(columns[field].shape, (len(values_dicts), ))
+
+        for i, values_dict in enumerate(values_dicts):
+            self.assertEqual(columns['dict_attr'][i], values_dict['dict_attr'])
+            self.assertEqual(columns['list_attr'][i], list(range(i + 1)))
+            self.assertEqual(columns['tuple_attr'][i], list(range(i + 2)))
+            self.assertIsInstance(columns['array_attr'][i], np.ndarray)
+            np.testing.assert_equal(
+                columns['array_attr'][i], np.arange(i + 1, dtype=np.float64))
+
+    def test_db_search_collection_initial_idn(self):
+        dbm.db_save_many(
+            self.client, self.database_name, self.collection_name,
+            [self.values_dict_1]*3)
+
+        # Without initial_idn the last documents are returned, with it the
+        # first documents from initial_idn on.
+        entries = dbm.db_search_collection(
+            self.client, self.database_name, self.collection_name,
+            fields=['id'], max_nr_lines=2)
+        self.assertEqual([e['id'] for e in entries], [4, 5])
+
+        entries = dbm.db_search_collection(
+            self.client, self.database_name, self.collection_name,
+            fields=['id'], initial_idn=2, max_nr_lines=2)
+        self.assertEqual([e['id'] for e in entries], [2, 3])
+
+        entries = dbm.db_search_collection(
+            self.client, self.database_name, self.collection_name,
+            fields=['id'], filters=['1~4'], initial_idn=3)
+        self.assertEqual([e['id'] for e in entries], [3, 4])
+
+        entries = dbm.db_search_collection(
+            self.client, self.database_name, self.collection_name,
+            fields=['id'], filters=['3~5'], initial_idn=1)
+        self.assertEqual([e['id'] for e in entries], [3, 4, 5])
+
     def test_db_read(self):
         rvalues_dict = dbm.db_read(
             self.client, self.database_name, self.collection_name, 1)
@@ -548,6 +674,77 @@ class TestMongoDatabaseNonEmptycollection(unittest.TestCase):
             self.client, self.database_name, self.collection_name, 1)
         np.testing.assert_equal(rvalues_dict, new_values_dict)
 
+    def test_db_save_id_taken(self):
+        # A document saved without the id counter takes the next id.
+        self.client[self.database_name][self.collection_name].insert_one(
+            {'id': 3})
+
+        ridn = dbm.db_save(
+            self.client, self.database_name,
+            self.collection_name, self.values_dict_1)
+        self.assertEqual(ridn, 4)
+
+    def test_db_save_without_id_index(self):
+        # Collections created by other tools may not have the id index.
+        collection_name = 'other_collection'
+        self.client[self.database_name][collection_name].insert_one(
+            {'id': 1})
+
+        ridn = dbm.db_save(
+            self.client, self.database_name,
+            collection_name, self.values_dict_1)
+        self.assertEqual(ridn, 2)
+        self.assertEqual(dbm.db_get_first_id(
+            self.client, self.database_name, collection_name), 1)
+        self.assertEqual(dbm.db_get_last_id(
+            self.client, self.database_name, collection_name), 2)
+
+    def test_db_save_many(self):
+        with self.assertRaises(dbm.MongoDatabaseError):
+            dbm.db_save_many(
+                self.client, self.database_name, self.collection_name, [])
+
+        ridns = dbm.db_save_many(
+            self.client, self.database_name, self.collection_name,
+            [self.values_dict_1, self.values_dict_2])
+        self.assertEqual(ridns, [3, 4])
+
+        rvalues_dict = dbm.db_read(
+            self.client, self.database_name, self.collection_name, 4)
+        values_dict = dict(self.values_dict_2)
+        values_dict['id'] = 4
+        np.testing.assert_equal(rvalues_dict, values_dict)
+
+        self.client[self.database_name][self.collection_name].insert_one(
+            {'id': 5})
+
+        ridns = dbm.db_save_many(
+            self.client, self.database_name, self.collection_name,
+            [self.values_dict_1])
+        self.assertEqual(ridns, [6])
+
+    def test_db_update_many(self):
+        new_values_dict_1 = dict(self.values_dict_1)
+        new_values_dict_1['str_attr'] = 'other_string'
+        new_values_dict_2 = dict(self.values_dict_2)
+        new_values_dict_2['str_attr'] = 'other_new_string'
+
+        self.assertTrue(dbm.db_update_many(
+            self.client, self.database_name, self.collection_name,
+            [new_values_dict_1, new_values_dict_2], [1, 2]))
+
+        rvalues_dict = dbm.db_read(
+            self.client, self.database_name, self.collection_name, 2)
+        np.testing.assert_equal(rvalues_dict, new_values_dict_2)
+
+        self.assertFalse(dbm.db_update_many(
+            self.client, self.database_name, self.collection_name,
+            [self.values_dict_1, self.values_dict_2], [1, 10]))
+
+        rvalues_dict = dbm.db_read(
+            self.client, self.database_name, self.collection_name, 1)
+        np.testing.assert_equal(rvalues_dict, new_values_dict_1)
+
 
 if __name__ == '__main__':
     unittest.main()
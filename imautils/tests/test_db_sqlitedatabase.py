@@ -3,6 +3,7 @@ import os
 import json
 import unittest
 import sqlite3
+import threading
 import numpy as np
 
 from imautils.db import sqlitedatabase as dbm
@@ -20,6 +21,7 @@ class TestSqliteDatabaseEmptyTable(unittest.TestCase):
             self.database_name, self.table_name, {})
        
     def tearDown(self):
+        dbm.close_connections()
         try:
             os.remove(self.database_name)
         except Exception:
@@ -332,6 +334,7 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
             self.database_name, self.table_name, self.values_dict_2)
         
     def tearDown(self):
+        dbm.close_connections()
         try:
             os.remove(self.database_name)
         except Exception:
@@ -357,6 +360,19 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
             rvalues = dbm.db_get_values(
                 self.database_name, self.table_name, 'other_name')
 
+    def test_db_get_values_distinct(self):
+        values_dict = dict(self.values_dict_1)
+        values_dict['id'] = 3
+        dbm.db_save(self.database_name, self.table_name, values_dict)
+
+        rvalues = dbm.db_get_values(
+            self.database_name, self.table_name, 'date', distinct=True)
+        self.assertEqual(sorted(rvalues), ['2020-01-14', '2020-01-15'])
+
+        rvalues = dbm.db_get_values(
+            self.database_name, self.table_name, 'hour', distinct=True)
+        self.assertEqual(rvalues, ['10:00:00'])
+
     def test_db_get_value(self):
         with self.assertRaises(Exception):
             rvalue = dbm.db_get_value(
@@ -382,6 +398,18 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
             
             self.assertIsNone(rvalue)
 
+    def test_db_get_value_in(self):
+        with self.assertRaises(dbm.SqliteDatabaseError):
+            dbm.db_get_value_in(
+                self.database_name, self.table_name, 'other_name', [1])
+
+        for name in self.column_names:
+            rvalues = dbm.db_get_value_in(
+                self.database_name, self.table_name, name, [2, 1, 3])
+            self.assertEqual(sorted(rvalues.keys()), [1, 2])
+            np.testing.assert_equal(rvalues[1], self.values_dict_1[name])
+            np.testing.assert_equal(rvalues[2], self.values_dict_2[name])
+
     def test_db_search_column(self):
         for name in self.column_names:
             idns = [self.values_dict_1['id'], self.values_dict_2['id']]
@@ -399,6 +427,20 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
             self.database_name, self.table_name, 'id', 3)
         self.assertEqual(len(entries), 0)
        
+    def test_db_search_column_in(self):
+        entries = dbm.db_search_column_in(
+            self.database_name, self.table_name, 'id', [2, 1, 3])
+        self.assertEqual([entry['id'] for entry in entries], [1, 2])
+
+        entries = dbm.db_search_column_in(
+            self.database_name, self.table_name, 'str_attr',
+            [self.values_dict_2['str_attr']])
+        np.testing.assert_equal(entries, [self.values_dict_2])
+
+        entries = dbm.db_search_column_in(
+            self.database_name, self.table_name, 'id', [])
+        self.assertEqual(len(entries), 0)
+
     def test_db_search_table(self):
         entries = dbm.db_search_table(
             self.database_name, self.table_name)
@@ -475,6 +517,38 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
             initial_idn=1, max_nr_lines=1)
         self.assertEqual(len(entries), 1)
     
+    def test_db_get_columns(self):
+        columns = dbm.db_get_columns(
+            self.database_name, self.table_name, ['date', 'str_attr'])
+        self.assertEqual(list(columns.keys()), ['id', 'date', 'str_attr'])
+        np.testing.assert_equal(columns['id'], [1, 2])
+        np.testing.assert_equal(
+            columns['str_attr'],
+            [self.values_dict_1['str_attr'], self.values_dict_2['str_attr']])
+
+        columns = dbm.db_get_columns(
+            self.database_name, self.table_name, 'str_attr',
+            [self.values_dict_2['str_attr']])
+        np.testing.assert_equal(columns['id'], [2])
+
+    def test_db_iter_table(self):
+        entries = list(dbm.db_iter_table(
+            self.database_name, self.table_name, page_size=1))
+        np.testing.assert_equal(
+            entries, [self.values_dict_1, self.values_dict_2])
+
+        entries = list(dbm.db_iter_table(
+            self.database_name, self.table_name, initial_idn=2))
+        np.testing.assert_equal(entries, [self.values_dict_2])
+
+        entries = list(dbm.db_iter_table(
+            self.database_name, self.table_name, 'str_attr',
+            [self.values_dict_1['str_attr']]))
+        self.assertEqual(
+            entries, dbm.db_search_table(
+                self.database_name, self.table_name, 'str_attr',
+                [self.values_dict_1['str_attr']]))
+
     def test_db_create_table(self):
         sucess = dbm.db_create_table(
             self.database_name, 'new_table', self.db_dict)
@@ -484,6 +558,51 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
             dbm.db_get_column_names(self.database_name, 'new_table'),
             self.column_names)
 
+    def test_db_search_table_invalid_filter(self):
+        for filt in [
+                '1 OR 1=1', '1; DROP TABLE test_table', '>= 1 OR 1=1',
+                '1~abc', '1~2~3', '~2', '>=abc']:
+            with self.assertRaises(dbm.SqliteDatabaseError):
+                dbm.db_search_table(
+                    self.database_name, self.table_name,
+                    columns=['id'], filters=[filt])
+
+        entries = dbm.db_search_table(
+            self.database_name, self.table_name,
+            columns=['id'], filters=['>=2'])
+        self.assertEqual([e['id'] for e in entries], [2])
+
+        entries = dbm.db_search_table(
+            self.database_name, self.table_name,
+            columns=['id'], filters=['1 ~ 1.5'])
+        self.assertEqual([e['id'] for e in entries], [1])
+
+    def test_db_search_table_initial_idn(self):
+        dbm.db_save_many(
+            self.database_name, self.table_name, [self.values_dict_1]*3)
+
+        # Without initial_idn the last entries are returned, with it the
+        # first entries from initial_idn on.
+        entries = dbm.db_search_table(
+            self.database_name, self.table_name,
+            columns=['id'], max_nr_lines=2)
+        self.assertEqual([e['id'] for e in entries], [4, 5])
+
+        entries = dbm.db_search_table(
+            self.database_name, self.table_name,
+            columns=['id'], initial_idn=2, max_nr_lines=2)
+        self.assertEqual([e['id'] for e in entries], [2, 3])
+
+        entries = dbm.db_search_table(
+            self.database_name, self.table_name,
+            columns=['id'], filters=['1~4'], initial_idn=3)
+        self.assertEqual([e['id'] for e in entries], [3, 4])
+
+        entries = dbm.db_search_table(
+            self.database_name, self.table_name,
+            columns=['id'], filters=['3~5'], initial_idn=1)
+        self.assertEqual([e['id'] for e in entries], [3, 4, 5])
+
     def test_db_read(self):
         rvalues_dict = dbm.db_read(self.database_name, self.table_name, 1)
         np.testing.assert_equal(rvalues_dict, self.values_dict_1)
@@ -534,6 +653,108 @@ class TestSqliteDatabaseNonEmptyTable(unittest.TestCase):
         rvalues_dict = dbm.db_read(self.database_name, self.table_name, 1)
         np.testing.assert_equal(rvalues_dict, new_values_dict)
 
+    def test_db_save_many(self):
+        new_values_dicts = []
+        for str_attr in ['string_a', 'string_b']:
+            new_values_dict = {}
+            for key, value in self.values_dict_1.items():
+                new_values_dict[key] = value
+            new_values_dict['id'] = None
+            new_values_dict['str_attr'] = str_attr
+            new_values_dicts.append(new_values_dict)
+
+        ridns = dbm.db_save_many(
+            self.database_name, self.table_name, new_values_dicts)
+        self.assertEqual(ridns, [3, 4])
+
+        for idn, new_values_dict in zip(ridns, new_values_dicts):
+            new_values_dict['id'] = idn
+            rvalues_dict = dbm.db_read(
+                self.database_name, self.table_name, idn)
+            np.testing.assert_equal(rvalues_dict, new_values_dict)
+
+    def test_db_save_many_threads(self):
+        new_values_dict = dict(self.values_dict_1)
+        new_values_dict['id'] = None
+        errors = []
+
+        def save():
+            try:
+                for _ in range(20):
+                    dbm.db_save_many(
+                        self.database_name, self.table_name,
+                        [new_values_dict, new_values_dict])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                dbm.close_connections()
+
+        threads = [threading.Thread(target=save) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            dbm.db_get_values(self.database_name, self.table_name, 'id'),
+            list(range(1, 163)))
+
+    def test_db_bulk_load(self):
+        con = sqlite3.connect(self.database_name)
+        con.execute('CREATE INDEX idx_str_attr ON {0} (str_attr)'.format(
+            self.table_name))
+        con.commit()
+        con.close()
+
+        new_values_dict = {}
+        for key, value in self.values_dict_1.items():
+            new_values_dict[key] = value
+        new_values_dict['id'] = None
+
+        with dbm.db_bulk_load(self.database_name, self.table_name) as con:
+            cur = con.cursor()
+            cur.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' "
+                "AND name='idx_str_attr'")
+            self.assertIsNone(cur.fetchone())
+            ridns = dbm.db_save_many(
+                self.database_name, self.table_name, [new_values_dict]*3)
+
+        self.assertEqual(ridns, [3, 4, 5])
+
+        con = sqlite3.connect(self.database_name)
+        cur = con.cursor()
+        cur.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' "
+            "AND name='idx_str_attr'")
+        self.assertIsNotNone(cur.fetchone())
+        con.close()
+
+    def test_db_update_many(self):
+        new_values_dicts = []
+        for values_dict in [self.values_dict_1, self.values_dict_2]:
+            new_values_dict = {}
+            for key, value in values_dict.items():
+                new_values_dict[key] = value
+            new_values_dict['str_attr'] = 'other_string'
+            new_values_dicts.append(new_values_dict)
+
+        self.assertTrue(dbm.db_update_many(
+            self.database_name, self.table_name, new_values_dicts, [1, 2]))
+
+        for idn, new_values_dict in zip([1, 2], new_values_dicts):
+            rvalues_dict = dbm.db_read(
+                self.database_name, self.table_name, idn)
+            np.testing.assert_equal(rvalues_dict, new_values_dict)
+
+        self.assertFalse(dbm.db_update_many(
+            self.database_name, self.table_name,
+            [self.values_dict_1, self.values_dict_2], [1, 10]))
+
+        rvalues_dict = dbm.db_read(self.database_name, self.table_name, 1)
+        np.testing.assert_equal(rvalues_dict, new_values_dicts[0])
+
 
 if __name__ == '__main__':
     unittest.main()
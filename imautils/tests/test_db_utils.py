@@ -0,0 +1,53 @@
+import json
+import unittest
+import numpy as np
+
+from imautils.db import utils
+
+
+class TestJson(unittest.TestCase):
+
+    def test_json_dumps_loads(self):
+        values = [
+            [1.0, 2.5, 3],
+            {'a': 1, 'b': [1, 2], 'c': 'string'},
+            (10, 20, 30),
+            np.array([100, 200, 300]),
+            np.array([[1.5, 2.5], [3.5, 4.5]]),
+            ]
+        for value in values:
+            rvalue = utils.json_loads(utils.json_dumps(value))
+            np.testing.assert_equal(rvalue, np.array(value).tolist())
+
+    def test_json_dumps_non_finite(self):
+        values = [
+            [1.0, float('nan')],
+            {'a': float('inf'), 'b': [-float('inf')]},
+            (np.float64('nan'), 1),
+            np.array([1.0, np.nan, np.inf]),
+            [np.array([1.0, np.nan]), 2],
+            ]
+        for value in values:
+            text = utils.json_dumps(value)
+            self.assertNotIn('null', text)
+
+            if isinstance(value, dict):
+                expected = json.loads(json.dumps(value))
+            else:
+                expected = [
+                    v.tolist() if isinstance(v, np.ndarray) else v
+                    for v in value]
+            np.testing.assert_equal(utils.json_loads(text), expected)
+
+        self.assertEqual(utils.json_dumps([None, 1.5]), '[null,1.5]')
+        np.testing.assert_equal(
+            utils.json_loads(utils.json_dumps([None, float('inf')])),
+            [None, float('inf')])
+
+        self.assertEqual(
+            utils.json_dumps([1.0, float('nan')]),
+            json.dumps([1.0, float('nan')], separators=(',', ':')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import unittest
+import threading
+
+from imautils.db import sqlitedatabase as dbm
+from imautils.db import writer as dbw
+
+
+_TEST_PATH = os.path.dirname(__file__)
+
+
+class TestDatabaseWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.database_name = os.path.join(_TEST_PATH, 'test_writer.db')
+        self.table_name = 'test_table'
+        dbm.db_create_table(self.database_name, self.table_name, {})
+
+        self.target = (False, None, self.database_name, self.table_name)
+        self.values_dict = {'id': None, 'date': '2020-01-14', 'hour': '10:00'}
+        self.writer = dbw.DatabaseWriter(max_wait=0.05)
+
+    def tearDown(self):
+        self.writer.close()
+        dbm.close_all_connections()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(self.database_name + suffix)
+            except Exception:
+                pass
+
+    def test_submit(self):
+        futures = [
+            self.writer.submit(self.target, self.values_dict)
+            for _ in range(5)]
+
+        idns = [future.result(timeout=5) for future in futures]
+        self.assertEqual(idns, [1, 2, 3, 4, 5])
+        self.assertEqual(
+            dbm.db_get_values(self.database_name, self.table_name, 'id'),
+            [1, 2, 3, 4, 5])
+
+    def test_flush(self):
+        futures = [
+            self.writer.submit(self.target, self.values_dict)
+            for _ in range(3)]
+
+        self.writer.flush()
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(
+            dbm.db_get_last_id(self.database_name, self.table_name), 3)
+
+    def test_close(self):
+        future = self.writer.submit(self.target, self.values_dict)
+        self.writer.close()
+        self.assertEqual(future.result(timeout=0), 1)
+        self.assertIsNone(self.writer._thread)
+
+        future = self.writer.submit(self.target, self.values_dict)
+        self.assertEqual(future.result(timeout=5), 2)
+
+    def test_callback(self):
+        idns = []
+        future = self.writer.submit(
+            self.target, self.values_dict, callback=idns.append)
+        self.assertEqual(future.result(timeout=5), 1)
+        self.assertEqual(idns, [1])
+
+    def test_callback_exception(self):
+        def callback(idn):
+            raise ValueError(idn)
+
+        future = self.writer.submit(
+            self.target, self.values_dict, callback=callback)
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+
+        future = self.writer.submit(self.target, self.values_dict)
+        self.assertEqual(future.result(timeout=5), 2)
+
+    def test_save_exception(self):
+        target = (False, None, self.database_name, 'other_table')
+        future = self.writer.submit(target, self.values_dict)
+        with self.assertRaises(dbm.SqliteDatabaseError):
+            future.result(timeout=5)
+
+        future = self.writer.submit(self.target, self.values_dict)
+        self.assertEqual(future.result(timeout=5), 1)
+
+    def test_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def callback(idn):
+            started.set()
+            release.wait()
+
+        # The writer thread is kept busy, so the next documents stay pending.
+        first = self.writer.submit(
+            self.target, self.values_dict, callback=callback)
+        self.assertTrue(started.wait(timeout=5))
+
+        cancelled = self.writer.submit(self.target, self.values_dict)
+        pending = self.writer.submit(self.target, self.values_dict)
+        self.assertTrue(cancelled.cancel())
+        release.set()
+
+        self.writer.flush()
+        self.assertEqual(first.result(timeout=0), 1)
+        self.assertTrue(cancelled.cancelled())
+        self.assertEqual(pending.result(timeout=0), 2)
+        self.assertEqual(
+            dbm.db_get_values(self.database_name, self.table_name, 'id'),
+            [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()